@@ -0,0 +1,77 @@
+import argparse
+import sys
+
+from benchmarks.suite import SIZES, SOLVER_MAX_SIZES, SOLVERS, compare_results, load_results, run_benchmarks, save_results
+from benchmarks.synthetic import generate_game_data, write_game_data
+
+
+def graph_options(args):
+    return {
+        'depth': args.depth,
+        'fan_in': args.fan_in,
+        'produced_ratio': args.produced_ratio,
+        'build_steps': tuple(args.build_steps),
+        'craftable_ratio': args.craftable_ratio,
+        'alternate_ratio': args.alternate_ratio,
+        'byproduct_ratio': args.byproduct_ratio,
+    }
+
+
+def add_graph_arguments(parser):
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--depth', type=int, default=6, help='number of crafted layers above the raw resources')
+    parser.add_argument('--fan-in', type=int, default=3, help='maximum number of ingredients per recipe')
+    parser.add_argument('--produced-ratio', type=float, default=0.3, help='share of recipes producing more than one item')
+    parser.add_argument('--build-steps', type=int, nargs=2, default=[1, 6], metavar=('MIN', 'MAX'))
+    parser.add_argument('--craftable-ratio', type=float, default=0.9, help='share of crafted recipes that can be handcrafted')
+    parser.add_argument('--alternate-ratio', type=float, default=0.2, help='share of crafted products with an alternate recipe')
+    parser.add_argument('--byproduct-ratio', type=float, default=0.1, help='share of alternate recipes with a byproduct')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks on synthetic recipe graphs.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help='write a synthetic game_data.json')
+    generate.add_argument('products', type=int)
+    generate.add_argument('--output', default='synthetic_game_data.json')
+    add_graph_arguments(generate)
+
+    run = commands.add_parser('run', help='time the benchmarks and save the results as JSON')
+    run.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    run.add_argument('--solvers', nargs='+', default=SOLVERS)
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('--max-solver-size', type=int, default=None,
+                     help=f'largest size to run the solvers at (default: {", ".join(f"{name} up to {size}" for name, size in SOLVER_MAX_SIZES.items())}, the others at every size)')
+    run.add_argument('--output', default='benchmark.json')
+    add_graph_arguments(run)
+
+    compare = commands.add_parser('compare', help='compare results against a baseline and flag regressions')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+
+    args = parser.parse_args()
+    if args.command == 'generate':
+        write_game_data(generate_game_data(args.products, seed=args.seed, **graph_options(args)), args.output)
+        print(f'Wrote {args.products} recipes to {args.output}')
+    elif args.command == 'run':
+        def progress(result):
+            print(f"{result['name']:<28} {result['size']:>6} {result['seconds'] * 1000.0:10.2f} ms", flush=True)
+
+        solver_max_sizes = None if args.max_solver_size is None else {name: args.max_solver_size for name in args.solvers}
+        results = run_benchmarks(args.sizes, args.repeat, args.seed, args.solvers, progress, solver_max_sizes, **graph_options(args))
+        save_results(results, args.output)
+        print(f'Wrote {len(results["results"])} results to {args.output}')
+    else:
+        rows = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+        for row in rows:
+            flag = 'REGRESSION' if row['regression'] else ''
+            print(f"{row['name']:<28} {row['size']:>6} {row['baseline'] * 1000.0:10.2f} ms -> {row['current'] * 1000.0:10.2f} ms  x{row['ratio']:.2f} {flag}")
+        regressions = sum(row['regression'] for row in rows)
+        print(f'{regressions} regression(s) in {len(rows)} benchmarks')
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
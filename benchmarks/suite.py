@@ -0,0 +1,232 @@
+import copy
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+import satisfactory
+from benchmarks.synthetic import generate_game_data, write_game_data
+
+SIZES = [10, 100, 1000, 10000]
+SOLVERS = ['FactorySolver', 'FactorySolver2', 'FactorySolverMILP']
+# largest graph each solver is benchmarked on by default. A single FactorySolver run takes minutes from 1k products
+# on, which the repeat budget of timed() can't cut short.
+SOLVER_MAX_SIZES = {'FactorySolver': 100}
+
+
+def reload(path, snapshot_path=None):
+    satisfactory.recipes.clear()
+    satisfactory.projects.clear()
+    satisfactory.buildings.clear()
+    satisfactory.init(path, snapshot_path)
+
+
+def load_synthetic(size, seed, **options):
+    # generate a graph, write it out and load it through init() exactly like the real game data.
+    data = generate_game_data(size, seed=seed, **options)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'game_data.json')
+        write_game_data(data, path)
+        reload(path, False)
+    return data
+
+
+def time_init(data, repeat):
+    # cold start: parsing the JSON and flattening the recipes, against loading the compiled snapshot.
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'game_data.json')
+        snapshot_path = os.path.join(directory, 'game_data.snapshot')
+        write_game_data(data, path)
+        json_runs = timed(lambda: reload(path, False), repeat)
+        reload(path, snapshot_path)
+        snapshot_runs = timed(lambda: reload(path, snapshot_path), repeat)
+    return json_runs, snapshot_runs
+
+
+def timed(function, repeat, budget=10.0):
+    # at least one run; further runs stop once budget seconds have been spent, so the slow solvers on the large
+    # graphs are not repeated.
+    runs = []
+    while len(runs) < repeat and (not runs or sum(runs) < budget):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def flatten_all():
+    satisfactory.flat_requirements.clear()
+    for product in satisfactory.recipe_order:
+        satisfactory.build_flat_requirements(product)
+    requirements = {}
+    for project in satisfactory.projects.values():
+        satisfactory.gather_project_requirements(project, requirements)
+    return requirements
+
+
+def benchmark_constraints():
+    constraints = satisfactory.FactoryConstraints()
+    constraints.conveyor_speed = 120
+    constraints.max_time = 10 * 60
+    return constraints
+
+
+def run_solver(solver_name, project_name):
+    solver = getattr(satisfactory, solver_name)()
+    return solver.optimize_machines(project_name, benchmark_constraints())
+
+
+def run_optimize_handcrafting(project_name):
+    # one machine for every product, so that automation is the bottleneck and there is spare time to handcraft.
+    solver = satisfactory.FactorySolver()
+    solver.prepare(project_name, benchmark_constraints())
+    solution = satisfactory.FactorySolution(solver.products)
+    solution.machine_array[:] = 1
+    solution.evaluate_solution_time(solver.constraints)
+    return lambda: solver.optimize_handcrafting(copy.copy(solution))
+
+
+def run_resolve(project_name):
+    # 10% more of the project's last requirement, solved again from scratch (cold) and from the previous trajectory
+    # with resolve() (warm). Both include preparing the solver.
+    constraints = benchmark_constraints()
+    requirement = satisfactory.projects[project_name]['requirements'][-1]
+    changes = {requirement['name']: max(1, requirement['quantity'] // 10)}
+    solutions = satisfactory.FactorySolver2().optimize_machines(project_name, constraints)
+
+    def cold():
+        requirement['quantity'] += changes[requirement['name']]
+        try:
+            return satisfactory.FactorySolver2().optimize_machines(project_name, constraints)
+        finally:
+            requirement['quantity'] -= changes[requirement['name']]
+
+    def warm():
+        solver = satisfactory.FactorySolver2()
+        solver.prepare(project_name, constraints)
+        return solver.resolve(solutions, constraints, changes)
+
+    return cold, warm
+
+
+def run_resolve_max_time(project_name):
+    # max_time cut by 10%, solved from scratch (cold) and with resolve() (warm). A max_time change is unsupported
+    # by resolve() and falls back to a cold solve, so the two should take the same time.
+    constraints = benchmark_constraints()
+    changed = copy.copy(constraints)
+    changed.max_time = constraints.max_time * 0.9
+    solutions = satisfactory.FactorySolver2().optimize_machines(project_name, constraints)
+
+    def cold():
+        return satisfactory.FactorySolver2().optimize_machines(project_name, changed)
+
+    def warm():
+        solver = satisfactory.FactorySolver2()
+        solver.prepare(project_name, constraints)
+        return solver.resolve(solutions, changed)
+
+    return cold, warm
+
+
+def run_benchmarks(sizes=SIZES, repeat=3, seed=0, solvers=SOLVERS, progress=None, solver_max_sizes=None, **options):
+    # solver_max_sizes maps a solver to the largest size it is run at (default SOLVER_MAX_SIZES); the other
+    # benchmarks run at every size.
+    if solver_max_sizes is None:
+        solver_max_sizes = SOLVER_MAX_SIZES
+    results = []
+
+    def record(name, size, runs, **extra):
+        result = {'name': name, 'size': size, 'seconds': statistics.median(runs), 'runs': runs, **extra}
+        results.append(result)
+        if progress:
+            progress(result)
+
+    for size in sizes:
+        data = load_synthetic(size, seed, **options)
+        json_runs, snapshot_runs = time_init(data, repeat)
+        record('init/json', size, json_runs)
+        record('init/snapshot', size, snapshot_runs)
+        requirements = flatten_all()
+        project_name = next(iter(satisfactory.projects))
+        project_requirements = {}
+        satisfactory.gather_project_requirements(satisfactory.projects[project_name], project_requirements)
+
+        record('flatten', size, timed(flatten_all, repeat), requirements=len(requirements))
+        record('power', size, timed(lambda: satisfactory.compute_power_requirements(requirements), repeat), requirements=len(requirements))
+        project_names = list(satisfactory.projects)
+        record('budget', size, timed(lambda: satisfactory.ProjectBudget(project_names).within(maximal=True), repeat), requirements=len(requirements))
+        for name, use_scipy in (('select_recipes/lp', True), ('select_recipes/unit_costs', False)):
+            selections = []
+            runs = timed(lambda: selections.append(satisfactory.select_project_recipes(project_names, use_scipy=use_scipy)), repeat)
+            selection = selections[-1]
+            alternates = sum(recipe['name'] != product for product, recipe in selection.recipes.items())
+            record(name, size, runs, requirements=len(selection.requirements), alternates=alternates, cost=selection.cost)
+        record('optimize_handcrafting', size, timed(run_optimize_handcrafting(project_name), repeat), requirements=len(project_requirements))
+        record('build_plan', size, timed(lambda: satisfactory.BuildPlanner(benchmark_constraints()).plan(project_names), repeat), projects=len(project_names))
+        cold, warm = run_resolve(project_name)
+        record('resolve/cold', size, timed(cold, repeat), requirements=len(project_requirements))
+        record('resolve/warm', size, timed(warm, repeat), requirements=len(project_requirements))
+        cold, warm = run_resolve_max_time(project_name)
+        record('resolve/max_time/cold', size, timed(cold, repeat), requirements=len(project_requirements))
+        record('resolve/max_time/warm', size, timed(warm, repeat), requirements=len(project_requirements))
+        for solver_name in solvers:
+            if size > solver_max_sizes.get(solver_name, size):
+                continue
+            solutions = []
+            runs = timed(lambda: solutions.append(run_solver(solver_name, project_name)), repeat)
+            final = solutions[-1][-1] if solutions[-1] else None
+            record(
+                f'solver/{solver_name}',
+                size,
+                runs,
+                requirements=len(project_requirements),
+                iterations=len(solutions[-1]),
+                machine_count=final.machine_count if final else None,
+                total_time=final.total_time if final else None,
+            )
+
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'seed': seed,
+            'repeat': repeat,
+            'solver_max_sizes': solver_max_sizes,
+            'options': options,
+        },
+        'results': results,
+    }
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, threshold=0.25, min_seconds=0.001):
+    # one row per benchmark present in both files. A benchmark regresses when it is more than threshold slower
+    # than the baseline; timings under min_seconds are too noisy to flag.
+    baseline_results = {(result['name'], result['size']): result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        key = (result['name'], result['size'])
+        if key not in baseline_results:
+            continue
+        before = baseline_results[key]['seconds']
+        after = result['seconds']
+        ratio = after / before if before > 0 else float('inf')
+        regression = ratio > 1.0 + threshold and after >= min_seconds
+        rows.append({'name': result['name'], 'size': result['size'], 'baseline': before, 'current': after, 'ratio': ratio, 'regression': regression})
+    return rows
@@ -0,0 +1,94 @@
+import json
+import random
+
+BUILDINGS = [
+    {'name': 'Miner', 'power': 5},
+    {'name': 'Smelter', 'power': 4},
+    {'name': 'Constructor', 'power': 4},
+    {'name': 'Assembler', 'power': 15},
+]
+RATES = [5, 7.5, 10, 15, 20, 30, 40, 60, 120]
+QUANTITIES = [10, 20, 50, 100, 200]
+INGREDIENT_QUANTITIES = [1, 1, 2, 3]
+
+
+def generate_game_data(products, depth=6, fan_in=3, produced_ratio=0.3, build_steps=(1, 6), craftable_ratio=0.9,
+                       project_count=3, project_size=None, alternate_ratio=0.2, byproduct_ratio=0.1, seed=0):
+    # a layered recipe DAG in the game_data.json format. Layer 0 holds the raw resources (mined, not craftable);
+    # every product in layer n takes 1..fan_in ingredients from the layers below, one of them always from layer
+    # n - 1 so the graph really is depth layers deep. produced_ratio is the share of recipes that produce more
+    # than one item per craft, craftable_ratio the share of non-raw recipes that can be handcrafted. Projects
+    # require project_size products from the top two layers, by default enough that a project's requirements grow
+    # with the graph. alternate_ratio is the share of crafted products that also get an alternate recipe (machine
+    # only, like the game's), byproduct_ratio the share of alternates that also make an item of a lower layer.
+    rng = random.Random(seed)
+    depth = max(1, min(depth, products - 1))
+    raw_count = max(1, products // (depth + 1))
+    layers = [[f'Resource {i}' for i in range(raw_count)]]
+    remaining = products - raw_count
+    for layer in range(1, depth + 1):
+        size = remaining // (depth - layer + 1)
+        layers.append([f'Part {layer}-{i}' for i in range(size)])
+        remaining -= size
+
+    recipes = [{'name': name, 'building': 'Miner', 'rate': rng.choice([60, 120, 240])} for name in layers[0]]
+    for layer in range(1, depth + 1):
+        below = [name for lower in layers[:layer] for name in lower]
+        for name in layers[layer]:
+            count = rng.randint(1, min(fan_in, len(below)))
+            ingredients = {rng.choice(layers[layer - 1])}
+            while len(ingredients) < count:
+                ingredients.add(rng.choice(below))
+            recipe = {
+                'name': name,
+                'building': 'Smelter' if layer == 1 else 'Assembler' if len(ingredients) > 1 else 'Constructor',
+                'rate': rng.choice(RATES),
+                'ingredients': [{'name': ingredient, 'quantity': rng.choice(INGREDIENT_QUANTITIES)} for ingredient in sorted(ingredients)],
+            }
+            if rng.random() < craftable_ratio:
+                recipe['build_steps'] = rng.randint(*build_steps)
+            if rng.random() < produced_ratio:
+                recipe['produced'] = rng.choice([2, 3, 4])
+            recipes.append(recipe)
+
+    # alternates come from a generator of their own, so the default recipes and projects don't depend on them.
+    alternate_rng = random.Random(seed + 1)
+    alternates = []
+    for layer in range(1, depth + 1):
+        below = [name for lower in layers[:layer] for name in lower]
+        for name in layers[layer]:
+            if alternate_rng.random() >= alternate_ratio:
+                continue
+            count = alternate_rng.randint(1, min(fan_in, len(below)))
+            ingredients = set()
+            while len(ingredients) < count:
+                ingredients.add(alternate_rng.choice(below))
+            alternate = {
+                'name': f'Alternate {name}',
+                'product': name,
+                'building': 'Assembler' if len(ingredients) > 1 else 'Constructor',
+                'rate': alternate_rng.choice(RATES),
+                'produced': alternate_rng.choice([1, 2, 3, 4]),
+                'ingredients': [{'name': ingredient, 'quantity': alternate_rng.choice(INGREDIENT_QUANTITIES)} for ingredient in sorted(ingredients)],
+            }
+            if alternate_rng.random() < byproduct_ratio:
+                alternate['byproducts'] = [{'name': alternate_rng.choice(below), 'quantity': alternate_rng.choice(INGREDIENT_QUANTITIES)}]
+            alternates.append(alternate)
+
+    top = [name for lower in layers[max(1, depth - 1):] for name in lower] or layers[0]
+    if project_size is None:
+        project_size = max(3, products // 50)
+    projects = []
+    for index in range(project_count):
+        required = rng.sample(top, min(project_size, len(top)))
+        projects.append({
+            'name': f'Project {index}',
+            'tier': index % 4 + 1,
+            'requirements': [{'name': name, 'quantity': rng.choice(QUANTITIES)} for name in required],
+        })
+    return {'recipes': recipes, 'alternates': alternates, 'buildings': [dict(building) for building in BUILDINGS], 'projects': projects}
+
+
+def write_game_data(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=1)
@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import time
+import zlib
+
+import numpy as np
+
+import satisfactory
+
+
+class SolveCache:
+    # persistent solve results: the whole solution trajectory of a solve, stored in SQLite under the solver's
+    # cache_key. Entries are evicted least recently used first once the stored data exceeds max_bytes.
+    # Solver processes can share one file. Keys carry satisfactory.CACHE_VERSION, so entries from solvers whose
+    # results have since changed are never hit.
+    def __init__(self, path='solve_cache.sqlite', max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path, timeout=60.0)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS solves (key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS solves_used ON solves (used)')
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM solves').fetchone()[0]
+
+    def __contains__(self, key):
+        return self.connection.execute('SELECT 1 FROM solves WHERE key = ?', (key,)).fetchone() is not None
+
+    def size(self):
+        return self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM solves').fetchone()[0]
+
+    def get(self, key, products):
+        row = self.connection.execute('SELECT data FROM solves WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with self.connection:
+            self.connection.execute('UPDATE solves SET used = ? WHERE key = ?', (time.time(), key))
+        records = json.loads(zlib.decompress(row[0]))
+        return [self.decode_solution(record, products) for record in records]
+
+    def put(self, key, solutions):
+        data = zlib.compress(json.dumps([self.encode_solution(solution) for solution in solutions], default=satisfactory.trace_value).encode())
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO solves (key, data, size, used) VALUES (?, ?, ?, ?)', (key, data, len(data), time.time()))
+            self.evict()
+
+    def evict(self):
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+        for key, size in self.connection.execute('SELECT key, size FROM solves ORDER BY used').fetchall():
+            self.connection.execute('DELETE FROM solves WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute('DELETE FROM solves')
+
+    @staticmethod
+    def encode_solution(solution):
+        # the scalar times are stored as computed rather than re-derived, so a cached solution is identical to the
+        # solved one.
+        return {
+            'name': solution.name,
+            'automation_time': solution.automation_time,
+            'handcrafting_time': solution.handcrafting_time,
+            'total_time': solution.total_time,
+            'machine_count': solution.machine_count,
+            'constructor_count': solution.constructor_count,
+            'machines': solution.machine_array,
+            'automation_times': solution.automation_time_array,
+            'automation_production': solution.automation_production_array,
+            'handcrafting_times': solution.handcrafting_time_array,
+            'handcrafting_production': solution.handcrafting_production_array,
+            'handcrafting_order': solution.handcrafting_order,
+        }
+
+    @staticmethod
+    def decode_solution(record, products):
+        solution = satisfactory.FactorySolution(products)
+        solution.name = record['name']
+        solution.machine_array = np.array(record['machines'], dtype=np.int64)
+        solution.automation_time_array = np.array(record['automation_times'], dtype=np.int64)
+        solution.automation_production_array = np.array(record['automation_production'], dtype=np.float64)
+        solution.handcrafting_time_array = np.array(record['handcrafting_times'], dtype=np.int64)
+        solution.handcrafting_production_array = np.array(record['handcrafting_production'], dtype=np.float64)
+        solution.handcrafting_order = record['handcrafting_order']
+        solution.automation_tree = satisfactory.MaxSegmentTree(solution.automation_time_array)
+        solution.automation_time = record['automation_time']
+        solution.handcrafting_time = record['handcrafting_time']
+        solution.total_time = record['total_time']
+        solution.machine_count = record['machine_count']
+        solution.constructor_count = record['constructor_count']
+        return solution
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import satisfactory
+from cache import SolveCache
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+SOLVERS = ('FactorySolver', 'FactorySolver2', 'FactorySolverMILP')
+
+worker_cache = None
+
+
+def init_worker(game_data_path, cache_path=None):
+    # runs once per worker process, so every solve finds the recipes and the flattened requirements loaded.
+    global worker_cache
+    satisfactory.init(game_data_path)
+    if cache_path is not None:
+        worker_cache = SolveCache(cache_path)
+
+
+def run_solve(request):
+    constraints = satisfactory.FactoryConstraints()
+    constraints.max_time = request['max_time']
+    constraints.conveyor_speed = request['conveyor_speed']
+    constraints.max_buildings = dict(request['max_buildings'])
+    solver = getattr(satisfactory, request['solver'])()
+    solver.cache = worker_cache
+    solutions = solver.optimize_machines(request['project'], constraints)
+    result = {
+        'project': request['project'],
+        'solver': request['solver'],
+        'iterations': len(solutions),
+        'solution': satisfactory.solution_record(solutions[-1]) if solutions else None,
+    }
+    if request['trajectory']:
+        result['trajectory'] = [satisfactory.solution_record(solution) for solution in solutions]
+    return result
+
+
+class SolverDaemon:
+    # resident solver service. The game data stays loaded in this process and in the pool workers, and results
+    # are kept in a bounded in-memory LRU in front of the workers' on-disk SolveCache. Requests are JSON objects,
+    # one per line; responses echo the request's "id" so a client can pipeline requests on one connection.
+    # Identical solves that arrive while one is in flight share its result instead of being solved again.
+    def __init__(self, game_data_path='game_data.json', workers=None, cache_path=None, memory_entries=256):
+        self.game_data_path = os.path.abspath(game_data_path)
+        self.cache_path = os.path.abspath(cache_path) if cache_path else None
+        self.memory_entries = memory_entries
+        self.results = OrderedDict()
+        self.in_flight = {}
+        self.counters = {'requests': 0, 'solves': 0, 'memory_hits': 0, 'coalesced': 0, 'errors': 0}
+        satisfactory.init(self.game_data_path)
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(self.game_data_path, self.cache_path))
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    async def serve(self, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def respond(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = {'id': request_id, 'ok': True, 'result': await self.handle(request)}
+        except Exception as error:
+            self.counters['errors'] += 1
+            response = {'id': request_id, 'ok': False, 'error': f'{type(error).__name__}: {error}'}
+        writer.write(json.dumps(response, default=satisfactory.trace_value).encode() + b'\n')
+        await writer.drain()
+
+    async def handle(self, request):
+        self.counters['requests'] += 1
+        op = request.get('op')
+        if op == 'optimize_machines':
+            return await self.solve(self.solve_request(request))
+        if op == 'gather_power_requirements_projects':
+            # a few dict passes over already flattened requirements: cheaper inline than a round trip to a worker.
+            project_names = request['projects']
+            unknown = [name for name in project_names if name not in satisfactory.projects]
+            if unknown:
+                raise ValueError(f'unknown project(s) {unknown}')
+            return {'projects': project_names, 'power': satisfactory.gather_power_requirements_projects(project_names)}
+        if op == 'projects':
+            return list(satisfactory.projects)
+        if op == 'stats':
+            return {**self.counters, 'cached_results': len(self.results), 'in_flight': len(self.in_flight)}
+        raise ValueError(f'unknown op {op!r}')
+
+    def solve_request(self, request):
+        # validated, with defaults filled in, so that equivalent requests coalesce to the same key.
+        if request.get('project') not in satisfactory.projects:
+            raise ValueError(f"unknown project {request.get('project')!r}")
+        solver = request.get('solver', 'FactorySolver2')
+        if solver not in SOLVERS:
+            raise ValueError(f'unknown solver {solver!r}, expected one of {list(SOLVERS)}')
+        max_time = int(request.get('max_time', 600))
+        conveyor_speed = int(request.get('conveyor_speed', 120))
+        if max_time <= 0 or conveyor_speed <= 0:
+            raise ValueError(f'max_time and conveyor_speed must be positive, got {max_time} and {conveyor_speed}')
+        return {
+            'project': request['project'],
+            'solver': solver,
+            'max_time': max_time,
+            'conveyor_speed': conveyor_speed,
+            'max_buildings': {product: int(cap) for product, cap in sorted(request.get('max_buildings', {}).items())},
+            'trajectory': bool(request.get('trajectory', False)),
+        }
+
+    async def solve(self, request):
+        key = json.dumps(request, sort_keys=True)
+        if key in self.results:
+            self.counters['memory_hits'] += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+        if key in self.in_flight:
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(self.in_flight[key])
+
+        self.counters['solves'] += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, run_solve, request)
+        self.in_flight[key] = future
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            del self.in_flight[key]
+        self.results[key] = result
+        if len(self.results) > self.memory_entries:
+            self.results.popitem(last=False)
+        return result
+
+
+def request(payload, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+    # send one request to a running daemon and return its result, raising RuntimeError if it failed.
+    if socket_path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        connection.connect(socket_path)
+    else:
+        connection = socket.create_connection((host, port), timeout)
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps(payload).encode() + b'\n')
+        stream.flush()
+        response = json.loads(stream.readline())
+    if not response['ok']:
+        raise RuntimeError(response['error'])
+    return response['result']
+
+
+def parse_caps(values):
+    # "Iron Ingot=2" -> {"Iron Ingot": 2}
+    caps = {}
+    for value in values or []:
+        product, _, cap = value.rpartition('=')
+        caps[product] = int(cap)
+    return caps
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resident solver service and its client.')
+    parser.add_argument('--socket', help='Unix socket path (default: TCP on --host/--port)')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='run the daemon')
+    serve.add_argument('--game-data', default='game_data.json')
+    serve.add_argument('--workers', type=int, default=None)
+    serve.add_argument('--cache', help='SQLite file caching solves between runs')
+
+    solve = commands.add_parser('solve', help='optimize the machines of a project')
+    solve.add_argument('project')
+    solve.add_argument('--solver', default='FactorySolver2', choices=SOLVERS)
+    solve.add_argument('--max-time', type=int, default=600)
+    solve.add_argument('--conveyor-speed', type=int, default=120)
+    solve.add_argument('--cap', action='append', help='building cap for a product, e.g. "Iron Ingot=2"')
+    solve.add_argument('--trajectory', action='store_true', help='return every iteration, not just the final solution')
+
+    power = commands.add_parser('power', help='power requirement of a set of projects')
+    power.add_argument('projects', nargs='+')
+
+    commands.add_parser('projects', help='list the projects')
+    commands.add_parser('stats', help='show the daemon counters')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        daemon = SolverDaemon(args.game_data, args.workers, args.cache)
+        print(f"Serving on {args.socket or f'{args.host}:{args.port}'}", flush=True)
+        try:
+            asyncio.run(daemon.serve(args.socket, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            daemon.close()
+            if args.socket is not None and os.path.exists(args.socket):
+                os.remove(args.socket)
+        return
+
+    if args.command == 'solve':
+        payload = {
+            'op': 'optimize_machines',
+            'project': args.project,
+            'solver': args.solver,
+            'max_time': args.max_time,
+            'conveyor_speed': args.conveyor_speed,
+            'max_buildings': parse_caps(args.cap),
+            'trajectory': args.trajectory,
+        }
+    elif args.command == 'power':
+        payload = {'op': 'gather_power_requirements_projects', 'projects': args.projects}
+    else:
+        payload = {'op': args.command}
+    try:
+        result = request(payload, args.socket, args.host, args.port)
+    except (OSError, RuntimeError) as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(result, indent=1))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,117 @@
 import json
 import math
+import bisect
+import contextlib
 import copy
+import cProfile
+import functools
+import hashlib
+import heapq
+import importlib.util
+import io
+import mmap
+import os
+import pstats
+import struct
+import time
+import tracemalloc
+from collections import namedtuple
+from collections.abc import MutableMapping
 from datetime import datetime
 
+import numpy as np
+
+# scipy is only imported by the first MILP solve: it takes longer to import than everything else put together.
+scipy_available = importlib.util.find_spec('scipy') is not None
+
 recipes = {}
 projects = {}
 buildings = {}
-log_file = open('satisfactory.log', 'w')
+recipe_order = []
+recipe_rank = {}
+flat_requirements = {}
+# alternate recipes per product, and the default recipes that use_recipes replaced in recipes.
+alternate_recipes = {}
+default_recipes = {}
+
+# log levels, from least to most verbose. Messages above log_level are dropped before they are formatted.
+LOG_OFF = 0
+LOG_SUMMARY = 1
+LOG_ITERATION = 2
+LOG_CANDIDATE = 3
+
+log_level = LOG_OFF
+log_file = None
+trace_file = None
+
+# SolverStats collecting timings and counters for the solve in progress, None when not profiling.
+profile_stats = None
+
+# part of every solve cache key (see cache.SolveCache): bump it when the solvers' results change.
+CACHE_VERSION = 2
+
+
+def sort_recipes():
+    # topological order of the recipe graph, ingredients before the products that consume them.
+    # iterative (Kahn's algorithm) so that deep recipe chains don't hit the recursion limit.
+    consumers = {name: [] for name in recipes}
+    pending = {}
+    for name, recipe in recipes.items():
+        ingredient_names = {ingredient["name"] for ingredient in recipe.get("ingredients", []) if ingredient["name"] in recipes}
+        pending[name] = len(ingredient_names)
+        for ingredient_name in ingredient_names:
+            consumers[ingredient_name].append(name)
+
+    order = [name for name, count in pending.items() if count == 0]
+    for name in order:
+        for consumer in consumers[name]:
+            pending[consumer] -= 1
+            if pending[consumer] == 0:
+                order.append(consumer)
+
+    if len(order) != len(recipes):
+        cycle = sorted(name for name, count in pending.items() if count > 0)
+        raise ValueError(f"Recipe graph contains a cycle involving {cycle}")
+    return order
+
+
+def build_flat_requirements(product):
+    # per-unit bill of materials: every ingredient needed (transitively) to make one unit of the product.
+    # ingredient vectors are built first, in topological order, so each one is computed exactly once.
+    if product in flat_requirements:
+        return flat_requirements[product]
 
+    closure = []
+    stack = [product]
+    seen = {product}
+    while stack:
+        name = stack.pop()
+        closure.append(name)
+        for ingredient in recipes[name].get("ingredients", []):
+            ingredient_name = ingredient["name"]
+            if ingredient_name in recipes and ingredient_name not in seen and ingredient_name not in flat_requirements:
+                seen.add(ingredient_name)
+                stack.append(ingredient_name)
+    closure.sort(key=recipe_rank.__getitem__)
 
-def add_ingredients(product, quantity, flat_requirements):
-    produced = recipes[product].get("produced", 1)
-    for ingredient in recipes[product].get("ingredients", {}):
-        ingredient_name = ingredient["name"]
-        ingredient_quantity = ingredient["quantity"] * quantity / produced
-        flat_requirements[ingredient_name] = flat_requirements.get(ingredient_name, 0) + ingredient_quantity
-        add_ingredients(ingredient_name, ingredient_quantity, flat_requirements)
+    for name in closure:
+        recipe = recipes[name]
+        produced = recipe.get("produced", 1)
+        per_unit = {}
+        # insertion order matches a depth-first expansion of the recipe tree, which the solvers iterate in.
+        for ingredient in recipe.get("ingredients", []):
+            ingredient_name = ingredient["name"]
+            ingredient_quantity = ingredient["quantity"] / produced
+            per_unit[ingredient_name] = per_unit.get(ingredient_name, 0) + ingredient_quantity
+            for sub_ingredient, sub_quantity in flat_requirements.get(ingredient_name, {}).items():
+                per_unit[sub_ingredient] = per_unit.get(sub_ingredient, 0) + ingredient_quantity * sub_quantity
+        flat_requirements[name] = per_unit
+    return flat_requirements[product]
+
+
+def add_ingredients(product, quantity, requirements):
+    for ingredient_name, ingredient_quantity in build_flat_requirements(product).items():
+        requirements[ingredient_name] = requirements.get(ingredient_name, 0) + ingredient_quantity * quantity
 
 
 def gather_project_requirements(project, requirements):
@@ -43,6 +139,300 @@ def gather_power_requirements_projects(projects_list):
     return math.ceil(compute_power_requirements(requirements))
 
 
+def recipe_machine_seconds(recipe):
+    return 60.0 * recipe.get("produced", 1) / recipe["rate"]
+
+
+def recipe_power_cost(recipe):
+    return buildings[recipe["building"]]["power"] * recipe_machine_seconds(recipe)
+
+
+def recipe_time_cost(recipe):
+    # by hand where the recipe can be handcrafted, on one machine otherwise.
+    return 0.45 * recipe["build_steps"] if recipe.get("build_steps") else recipe_machine_seconds(recipe)
+
+
+# what select_recipes minimizes: the cost of one craft of a recipe.
+RECIPE_OBJECTIVES = {
+    'machines': recipe_machine_seconds,
+    'power': recipe_power_cost,
+    'time': recipe_time_cost,
+}
+# relative extra cost of the alternate recipes, so that ties go to the default recipe.
+ALTERNATE_PENALTY = 1e-6
+
+RecipeSelection = namedtuple('RecipeSelection', ['objective', 'cost', 'recipes', 'crafts', 'requirements'])
+
+
+def recipe_options(product, alternates=True):
+    default = default_recipes.get(product, recipes[product])
+    return [default] + alternate_recipes.get(product, []) if alternates else [default]
+
+
+def recipe_choices(demand, alternates=True):
+    # the candidate recipes of every product that can take part in making the demand, ingredients before the
+    # products consuming them (unless alternates close a cycle). Products without a recipe are free inputs.
+    def enter(product):
+        entered.add(product)
+        options = recipe_options(product, alternates)
+        return product, options, iter([ingredient["name"] for recipe in options for ingredient in recipe.get("ingredients", [])])
+
+    choices = {}
+    entered = set()
+    for root in demand:
+        if root not in recipes or root in entered:
+            continue
+        stack = [enter(root)]
+        while stack:
+            product, options, pending = stack[-1]
+            for name in pending:
+                if name in recipes and name not in entered:
+                    stack.append(enter(name))
+                    break
+            else:
+                stack.pop()
+                choices[product] = options
+    return choices
+
+
+def select_recipes(demand, objective='machines', alternates=True, use_scipy=True):
+    # the recipes making demand ({product: quantity}) at the least total cost, the cost of a craft being given by
+    # RECIPE_OBJECTIVES[objective]. A linear program over the recipe hypergraph, one column per recipe counting its
+    # crafts and one row per product: crafts * (produced + byproducts - ingredients) >= demand. Solved with scipy's
+    # HiGHS on the sparse recipe matrix when scipy is installed; otherwise every product is made by its cheapest
+    # recipe per unit (select_unit_costs), which is the same optimum as long as no recipe has byproducts.
+    cost_of = RECIPE_OBJECTIVES[objective]
+    choices = recipe_choices(demand, alternates)
+    costs = np.array([
+        cost_of(recipe) * (1.0 if index == 0 else 1.0 + ALTERNATE_PENALTY)
+        for options in choices.values() for index, recipe in enumerate(options)
+    ])
+    if use_scipy and scipy_available:
+        crafts = solve_recipe_lp(choices, demand, costs)
+    else:
+        crafts = select_unit_costs(choices, demand, costs)
+
+    columns = [(product, recipe) for product, options in choices.items() for recipe in options]
+    crafts[crafts < 1e-9 * crafts.max(initial=0)] = 0.0
+    made = {}
+    for (product, recipe), recipe_crafts in zip(columns, crafts.tolist()):
+        if recipe_crafts > 0:
+            made.setdefault(product, []).append((recipe_crafts * recipe.get("produced", 1), recipe))
+    # demanded products first, then the rest with consumers ahead of their ingredients, like the tree expansion.
+    order = [product for product in demand if product in made] + [product for product in reversed(choices) if product in made and product not in demand]
+    return RecipeSelection(
+        objective=objective,
+        cost=float(costs @ crafts),
+        recipes={product: max(made[product], key=lambda entry: entry[0])[1] for product in order},
+        crafts={recipe["name"]: recipe_crafts for (_, recipe), recipe_crafts in zip(columns, crafts.tolist()) if recipe_crafts > 0},
+        requirements={product: sum(quantity for quantity, _ in made[product]) for product in order},
+    )
+
+
+def select_project_recipes(projects_list, objective='machines', alternates=True, use_scipy=True):
+    demand = {}
+    for project_name in projects_list:
+        for requirement in projects[project_name]["requirements"]:
+            demand[requirement["name"]] = demand.get(requirement["name"], 0) + requirement["quantity"]
+    return select_recipes(demand, objective, alternates, use_scipy)
+
+
+def solve_recipe_lp(choices, demand, costs):
+    import scipy.sparse
+    from scipy.optimize import linprog
+
+    rows = {product: i for i, product in enumerate(choices)}
+    row_indices = []
+    column_indices = []
+    values = []
+    column = 0
+    for product, options in choices.items():
+        for recipe in options:
+            entries = {product: recipe.get("produced", 1)}
+            for byproduct in recipe.get("byproducts", []):
+                entries[byproduct["name"]] = entries.get(byproduct["name"], 0) + byproduct["quantity"]
+            for ingredient in recipe.get("ingredients", []):
+                entries[ingredient["name"]] = entries.get(ingredient["name"], 0) - ingredient["quantity"]
+            for name, value in entries.items():
+                if name in rows and value != 0:
+                    row_indices.append(rows[name])
+                    column_indices.append(column)
+                    values.append(value)
+            column += 1
+
+    # net output >= demand, written as -A x <= -demand for linprog.
+    matrix = scipy.sparse.csr_matrix((np.negative(values, dtype=np.float64), (row_indices, column_indices)), shape=(len(rows), column))
+    bound = np.array([-demand.get(product, 0) for product in rows], dtype=np.float64)
+    result = linprog(costs, A_ub=matrix, b_ub=bound, bounds=(0, None), method='highs')
+    if result.status != 0:
+        raise ValueError(f'Recipe selection failed: {result.message}')
+    return result.x
+
+
+def select_unit_costs(choices, demand, costs):
+    # cheapest recipe per product by the cost of one unit: a craft's cost plus its ingredients' unit costs, over
+    # the items it makes. choices lists ingredients first, so relaxing the unit costs in that order settles in one
+    # pass unless alternates close a cycle. The demand is then expanded down the chosen recipes, consumers first.
+    offsets = {}
+    offset = 0
+    for product, options in choices.items():
+        offsets[product] = offset
+        offset += len(options)
+    unit_costs = {product: math.inf for product in choices}
+    best = {}
+    for _ in range(len(choices) + 1):
+        changed = False
+        for product, options in choices.items():
+            for index, recipe in enumerate(options):
+                cost = costs[offsets[product] + index]
+                for ingredient in recipe.get("ingredients", []):
+                    cost += ingredient["quantity"] * unit_costs.get(ingredient["name"], 0.0)
+                unit_cost = cost / recipe.get("produced", 1)
+                if unit_cost < unit_costs[product] * (1.0 - 1e-12):
+                    unit_costs[product] = unit_cost
+                    best[product] = index
+                    changed = True
+        if not changed:
+            break
+
+    # consumers before their ingredients along the chosen recipes (Kahn's algorithm, as in sort_recipes).
+    pending = {product: 0 for product in choices}
+    for product in choices:
+        for ingredient in choices[product][best[product]].get("ingredients", []):
+            if ingredient["name"] in pending:
+                pending[ingredient["name"]] += 1
+    order = [product for product, consumers in pending.items() if consumers == 0]
+    for product in order:
+        for ingredient in choices[product][best[product]].get("ingredients", []):
+            if ingredient["name"] in pending:
+                pending[ingredient["name"]] -= 1
+                if pending[ingredient["name"]] == 0:
+                    order.append(ingredient["name"])
+    if len(order) != len(choices):
+        cycle = sorted(product for product, consumers in pending.items() if consumers > 0)
+        raise ValueError(f"Chosen recipes contain a cycle involving {cycle}, which needs the scipy recipe selection")
+
+    crafts = np.zeros(offset)
+    needed = dict(demand)
+    for product in order:
+        recipe = choices[product][best[product]]
+        recipe_crafts = needed.get(product, 0) / recipe.get("produced", 1)
+        crafts[offsets[product] + best[product]] = recipe_crafts
+        for ingredient in recipe.get("ingredients", []):
+            needed[ingredient["name"]] = needed.get(ingredient["name"], 0) + recipe_crafts * ingredient["quantity"]
+    return crafts
+
+
+def use_recipes(product_recipes):
+    # make the solvers and compute_power_requirements use the given recipe per product ({product: recipe}, e.g. a
+    # RecipeSelection's recipes) in place of the defaults; None goes back to the defaults. The tree expansion is
+    # rebuilt for the new recipes. It doesn't credit byproducts, and a product that a selection makes with a mix of
+    # recipes is made with the one making most of it.
+    for product, recipe in default_recipes.items():
+        recipes[product] = recipe
+    default_recipes.clear()
+    for product, recipe in (product_recipes or {}).items():
+        if recipe is not recipes[product]:
+            default_recipes[product] = recipes[product]
+            recipes[product] = recipe
+    recipe_order[:] = sort_recipes()
+    recipe_rank.clear()
+    recipe_rank.update({name: rank for rank, name in enumerate(recipe_order)})
+    flat_requirements.clear()
+    for product in recipe_order:
+        build_flat_requirements(product)
+
+
+BudgetCombination = namedtuple('BudgetCombination', ['projects', 'power', 'resources'])
+
+
+class ProjectBudget:
+    # power and raw resources of every combination of projects, numbered by bitmask (bit k for project_names[k]) and
+    # summed from the projects' rows of requirements @ per-unit costs.
+    def __init__(self, project_names=None):
+        self.project_names = list(projects) if project_names is None else list(project_names)
+        gathered = []
+        index = {}
+        for project_name in self.project_names:
+            requirements = {}
+            gather_project_requirements(projects[project_name], requirements)
+            for product in requirements:
+                index.setdefault(product, len(index))
+            gathered.append(requirements)
+        self.products = list(index)
+        self.requirements = np.zeros((len(self.project_names), len(self.products)))
+        for row, requirements in enumerate(gathered):
+            self.requirements[row, [index[product] for product in requirements]] = list(requirements.values())
+
+        self.resources = [product for product in self.products if not recipes[product].get("ingredients")]
+        self.columns = ['power'] + self.resources
+        per_unit = np.zeros((len(self.products), len(self.columns)))
+        per_unit[:, 0] = [buildings[recipes[product]["building"]]["power"] * 60.0 / recipes[product]["rate"] for product in self.products]
+        per_unit[[index[product] for product in self.resources], np.arange(1, len(self.columns))] = 1.0
+        self.budget = self.requirements @ per_unit
+        self.tiers = [projects[project_name].get("tier") for project_name in self.project_names]
+        self.column_totals = {}
+
+    def totals(self, column='power'):
+        # the column's total for every combination, indexed by bitmask.
+        if column not in self.column_totals:
+            totals = np.zeros(1)
+            for value in self.budget[:, self.columns.index(column)].tolist():
+                totals = np.concatenate([totals, totals + value])
+            self.column_totals[column] = totals
+        return self.column_totals[column]
+
+    def mask(self, project_names):
+        return sum(1 << self.project_names.index(project_name) for project_name in set(project_names))
+
+    def combination(self, mask):
+        members = [k for k in range(len(self.project_names)) if mask >> k & 1]
+        row = self.budget[members].sum(axis=0)
+        return BudgetCombination(tuple(self.project_names[k] for k in members), float(row[0]), dict(zip(self.resources, row[1:].tolist())))
+
+    def within(self, max_power=math.inf, max_resources=None, include=(), maximal=False, limit=None):
+        # bitmasks of the combinations within max_power and the max_resources ({resource: quantity}) that contain
+        # the include projects, least power first; combination() spells one out. maximal keeps only those that no
+        # further project fits into.
+        power = self.totals('power')
+        selected = power <= max_power
+        for resource, max_quantity in (max_resources or {}).items():
+            selected &= self.totals(resource) <= max_quantity
+        masks = np.arange(len(selected))
+        if include:
+            required = self.mask(include)
+            selected &= (masks & required) == required
+        if maximal:
+            fits = selected.copy()
+            for k in range(len(self.project_names)):
+                bit = 1 << k
+                selected &= ((masks & bit) != 0) | ~fits[masks | bit]
+        hits = np.flatnonzero(selected)
+        return hits[np.argsort(power[hits], kind='stable')][:limit]
+
+    def ordering(self, project_names):
+        # the running budget while building the projects in this order.
+        mask = 0
+        running = []
+        for project_name in project_names:
+            mask |= self.mask([project_name])
+            running.append(self.combination(mask))
+        return running
+
+    def tier_rollup(self, cumulative=False):
+        # the budget of each tier's projects together, or with cumulative of every project up to that tier.
+        # projects without a tier are rolled up under None, on their own.
+        tiers = sorted({tier for tier in self.tiers if tier is not None})
+        rollup = {}
+        for tier in tiers:
+            members = [name for name, project_tier in zip(self.project_names, self.tiers) if project_tier is not None and (project_tier <= tier if cumulative else project_tier == tier)]
+            rollup[tier] = self.combination(self.mask(members))
+        untiered = [name for name, project_tier in zip(self.project_names, self.tiers) if project_tier is None]
+        if untiered:
+            rollup[None] = self.combination(self.mask(untiered))
+        return rollup
+
+
 def ftime(secs):
     if secs < 60:
         return f"{secs}s"
@@ -50,419 +440,2218 @@ def ftime(secs):
         return f"{math.floor(secs / 60)}:{secs % 60:0>2d}"
 
 
-def log(s):
+def open_log(path="satisfactory.log", level=LOG_CANDIDATE, trace_path=None):
+    # logging is off until this is called. path=None skips the text log, trace_path adds a JSON-lines trace of
+    # the solver events (one object per line) that can be replayed without parsing the text log.
+    global log_level, log_file, trace_file
+    close_log()
+    log_level = level
+    if path is not None:
+        log_file = open(path, "w")
+    if trace_path is not None:
+        trace_file = open(trace_path, "w")
+
+
+def close_log():
+    global log_level, log_file, trace_file
+    for f in (log_file, trace_file):
+        if f is not None:
+            f.close()
+    log_level = LOG_OFF
+    log_file = None
+    trace_file = None
+
+
+def log_enabled(level):
+    return level <= log_level
+
+
+@contextlib.contextmanager
+def log_level_at_most(level):
+    # lowers the log level for the duration of the with block, e.g. around solves that are only a means to an end.
+    global log_level
+    previous_level = log_level
+    log_level = min(log_level, level)
+    try:
+        yield
+    finally:
+        log_level = previous_level
+
+
+def log(s, level=LOG_SUMMARY):
+    # s may be a callable returning the message, so that expensive messages are only built when they are written.
+    if level > log_level or log_file is None:
+        return
+    start = time.perf_counter()
+    if callable(s):
+        s = s()
     print(s, file=log_file)
+    if profile_stats is not None:
+        profile_stats.add_time('logging', time.perf_counter() - start)
+
+
+def trace_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def trace(event, level=LOG_ITERATION, **fields):
+    if level > log_level or trace_file is None:
+        return
+    start = time.perf_counter()
+    print(json.dumps({"event": event, **fields}, default=trace_value), file=trace_file)
+    if profile_stats is not None:
+        profile_stats.add_time('logging', time.perf_counter() - start)
+
+
+def trace_solution(event, solution, level=LOG_ITERATION, **fields):
+    if level > log_level or trace_file is None:
+        return
+    trace(
+        event,
+        level,
+        name=solution.name,
+        machine_count=solution.machine_count,
+        constructor_count=solution.constructor_count,
+        total_time=solution.total_time,
+        automation_time=solution.automation_time,
+        handcrafting_time=solution.handcrafting_time,
+        machines={product: count for product, count in solution.machines.items() if count > 0},
+        **fields,
+    )
+
+
+class SolverStats:
+    # per-phase wall-clock times and event counters of one profiled solve. Phase times are inclusive: the copies
+    # made inside optimize_handcrafting also count towards optimize_handcrafting.
+    def __init__(self, solver_name='', project_name=''):
+        self.solver_name = solver_name
+        self.project_name = project_name
+        self.seconds = 0.0
+        self.phase_times = {}
+        self.phase_calls = {}
+        self.counters = {}
+        self.profile = None
+        self.memory = None
+
+    def add_time(self, phase, seconds):
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+
+    def count(self, counter, n=1):
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def as_dict(self):
+        return {
+            'solver': self.solver_name,
+            'project': self.project_name,
+            'seconds': self.seconds,
+            'phases': {phase: {'seconds': seconds, 'calls': self.phase_calls[phase]} for phase, seconds in self.phase_times.items()},
+            'counters': dict(self.counters),
+            'profile': self.profile,
+            'memory': self.memory,
+        }
+
+    def summary(self):
+        lines = [f'{self.solver_name} on {self.project_name}: {self.seconds * 1000.0:.1f} ms']
+        for phase, seconds in sorted(self.phase_times.items(), key=lambda item: -item[1]):
+            share = 100.0 * seconds / self.seconds if self.seconds else 0.0
+            lines.append(f'  {phase:<40} {seconds * 1000.0:10.1f} ms {share:5.1f}% {self.phase_calls[phase]:>9} calls')
+        for counter, value in self.counters.items():
+            lines.append(f'  {counter:<40} {value:>10}')
+        if self.memory is not None:
+            lines.append(f"  {'peak traced memory':<40} {self.memory['peak'] / 1024.0:10.1f} KiB")
+        return '\n'.join(lines)
+
+
+def profiled(phase):
+    # time every call of the decorated function under phase while a profiled solve is running.
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if profile_stats is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile_stats.add_time(phase, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def count(counter, n=1):
+    if profile_stats is not None:
+        profile_stats.count(counter, n)
 
 
 class FactoryConstraints:
-    conveyor_speed = 0
-    max_time = 0
-    max_buildings = {}
+    def __init__(self):
+        self.conveyor_speed = 0
+        self.max_time = 0
+        self.max_buildings = {}
+
+
+class ProductIndex:
+    # product <-> array index mapping, fixed for the duration of a solve, along with the per-product recipe data
+    # that the solution arrays are evaluated against.
+    __slots__ = ('names', 'index', 'quantities', 'rates', 'produced', 'build_steps', 'constructors', 'handcrafting_efficiencies')
+
+    def __init__(self, requirements):
+        self.names = list(requirements.keys())
+        self.index = {product: i for i, product in enumerate(self.names)}
+        product_recipes = [recipes[product] for product in self.names]
+        self.quantities = np.array([requirements[product] for product in self.names], dtype=np.float64)
+        self.rates = np.array([recipe["rate"] for recipe in product_recipes], dtype=np.float64)
+        self.produced = np.array([recipe.get("produced", 1) for recipe in product_recipes], dtype=np.float64)
+        self.build_steps = np.array([recipe.get("build_steps", 0) for recipe in product_recipes], dtype=np.float64)
+        self.constructors = np.array([recipe["building"] == "Constructor" for recipe in product_recipes], dtype=bool)
+        self.handcrafting_efficiencies = np.array(
+            [handcrafting_efficiency(product) if recipe.get("build_steps", 0) else 0.0 for product, recipe in zip(self.names, product_recipes)]
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+
+class ProductView(MutableMapping):
+    # dict-like view of one of a solution's per-product arrays.
+    # when skip_zeros is set, zero entries behave as if they were absent when iterating.
+    __slots__ = ('products', 'values', 'skip_zeros')
+
+    def __init__(self, products, values, skip_zeros):
+        self.products = products
+        self.values = values
+        self.skip_zeros = skip_zeros
+
+    def __getitem__(self, product):
+        return self.values[self.products.index[product]].item()
+
+    def __setitem__(self, product, value):
+        self.values[self.products.index[product]] = value
+
+    def __delitem__(self, product):
+        self.values[self.products.index[product]] = 0
+
+    def __iter__(self):
+        if self.skip_zeros:
+            return (self.products.names[i] for i in np.flatnonzero(self.values))
+        return iter(self.products.names)
+
+    def __len__(self):
+        if self.skip_zeros:
+            return int(np.count_nonzero(self.values))
+        return len(self.products.names)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class MaxSegmentTree:
+    # indexed max over a fixed number of non-negative values: point updates in O(log n), max in O(1).
+    __slots__ = ('size', 'tree')
+
+    def __init__(self, values):
+        size = 1
+        while size < len(values):
+            size *= 2
+        tree = np.zeros(2 * size, dtype=np.int64)
+        tree[size:size + len(values)] = values
+        level = size
+        while level > 1:
+            tree[level // 2:level] = np.maximum(tree[level:2 * level:2], tree[level + 1:2 * level:2])
+            level //= 2
+        self.size = size
+        self.tree = tree.tolist()
+
+    def __copy__(self):
+        cpy = MaxSegmentTree.__new__(MaxSegmentTree)
+        cpy.size = self.size
+        cpy.tree = self.tree.copy()
+        return cpy
+
+    def update(self, i, value):
+        tree = self.tree
+        i += self.size
+        tree[i] = value
+        i //= 2
+        while i:
+            largest = max(tree[2 * i], tree[2 * i + 1])
+            if tree[i] == largest:
+                break
+            tree[i] = largest
+            i //= 2
+
+    def max(self):
+        return self.tree[1]
 
 
 class FactorySolution:
-    name = ''
-    automation_time = 0
-    handcrafting_time = 0
-    total_time = 0
-    machine_count = 0
-    constructor_count = 0
-    machines = {}
-    automation_times = {}
-    automation_production = {}
-    handcrafting_times = {}
-    handcrafting_production = {}
-    handcrafting_order = []
+    __slots__ = (
+        'products',
+        'name',
+        'automation_time',
+        'handcrafting_time',
+        'total_time',
+        'machine_count',
+        'constructor_count',
+        'machine_array',
+        'automation_time_array',
+        'automation_production_array',
+        'handcrafting_time_array',
+        'handcrafting_production_array',
+        'handcrafting_order',
+        'automation_tree',
+    )
+
+    def __init__(self, products):
+        self.products = products
+        self.name = ''
+        self.automation_time = 0
+        self.handcrafting_time = 0
+        self.total_time = 0
+        self.machine_count = 0
+        self.constructor_count = 0
+        self.machine_array = np.zeros(len(products), dtype=np.int64)
+        self.automation_time_array = np.zeros(len(products), dtype=np.int64)
+        self.automation_production_array = np.zeros(len(products), dtype=np.float64)
+        self.handcrafting_time_array = np.zeros(len(products), dtype=np.int64)
+        self.handcrafting_production_array = np.zeros(len(products), dtype=np.float64)
+        self.handcrafting_order = []
+        self.automation_tree = MaxSegmentTree(self.automation_time_array)
 
+    @profiled('copy')
     def __copy__(self):
-        cpy = FactorySolution()
+        cpy = FactorySolution.__new__(FactorySolution)
+        cpy.products = self.products
+        cpy.name = self.name
         cpy.handcrafting_time = self.handcrafting_time
         cpy.automation_time = self.automation_time
         cpy.total_time = self.total_time
         cpy.machine_count = self.machine_count
         cpy.constructor_count = self.constructor_count
-        cpy.machines = self.machines.copy()
-        cpy.automation_times = self.automation_times.copy()
-        cpy.handcrafting_times = self.handcrafting_times.copy()
-        cpy.automation_production = self.automation_production.copy()
-        cpy.handcrafting_production = self.handcrafting_production.copy()
+        cpy.machine_array = self.machine_array.copy()
+        cpy.automation_time_array = self.automation_time_array.copy()
+        cpy.handcrafting_time_array = self.handcrafting_time_array.copy()
+        cpy.automation_production_array = self.automation_production_array.copy()
+        cpy.handcrafting_production_array = self.handcrafting_production_array.copy()
         cpy.handcrafting_order = self.handcrafting_order.copy()
+        cpy.automation_tree = copy.copy(self.automation_tree)
         return cpy
-    
+
+    @property
+    def machines(self):
+        return ProductView(self.products, self.machine_array, False)
+
+    @property
+    def automation_times(self):
+        return ProductView(self.products, self.automation_time_array, True)
+
+    @property
+    def automation_production(self):
+        return ProductView(self.products, self.automation_production_array, True)
+
+    @property
+    def handcrafting_times(self):
+        return ProductView(self.products, self.handcrafting_time_array, True)
+
+    @property
+    def handcrafting_production(self):
+        return ProductView(self.products, self.handcrafting_production_array, True)
+
+    def blockers(self):
+        # automated products whose completion time determines the total time.
+        blocking = (self.automation_time_array == self.total_time) & (self.automation_time_array != 0)
+        return {self.products.names[i] for i in np.flatnonzero(blocking)}
+
     def compute_derived_values(self):
-        self.automation_time = max(self.automation_times.values(), default=0)
-        self.handcrafting_time = sum(self.handcrafting_times.values())
+        self.automation_tree = MaxSegmentTree(self.automation_time_array)
+        self.automation_time = self.automation_tree.max()
+        self.handcrafting_time = int(self.handcrafting_time_array.sum())
         self.total_time = max(self.automation_time, self.handcrafting_time)
-        self.machine_count = sum(self.machines.values())
-        self.constructor_count = sum({count for name, count in self.machines.items() if recipes[name]["building"] == "Constructor"})
-    
-    def log_machines(self, requirements):
-        log('')
-        log('Machines allocated:')
+        self.machine_count = int(self.machine_array.sum())
+        self.constructor_count = int(self.machine_array[self.products.constructors].sum())
+
+    def log_machines(self, requirements, level=LOG_SUMMARY):
+        if not log_enabled(level):
+            return
+        log('', level)
+        log('Machines allocated:', level)
         for product, count in self.machines.items():
-            log(f'{count} {product} {ftime(self.automation_times[product])} ({requirements[product]} @ {count} * {recipes[product]["rate"]}/min)')
-        log(f'Total automation time {ftime(self.automation_time)}')
-        log(f'{self.constructor_count} constructors')
-        log(f'{self.machine_count} machines')
-
-    def evaluate_solution_time(self, requirements, constraints):
-        self.handcrafting_times = {}
-        self.handcrafting_production = {}
-        self.automation_times = {}
-        self.automation_production = {}
-        self.handcrafting_time = 0
-        self.automation_time = 0
-        self.handcrafting_order = []
-        for product, quantity in requirements.items():
-            recipe = recipes[product]
-            machine_count = self.machines[product]
-            if machine_count == 0:
-                time = math.ceil(quantity / recipe.get("produced", 1) * recipe["build_steps"] * 0.45)
-                self.handcrafting_times[product] = time
-                self.handcrafting_time += time
-                self.handcrafting_production[product] = quantity
-                self.handcrafting_order.append(product)
-            else:
-                time = math.ceil(60.0 * quantity / (machine_count * min(constraints.conveyor_speed, recipe["rate"])))
-                self.automation_times[product] = time
-                self.automation_time = max(self.automation_time, time)
-                self.automation_production[product] = quantity
+            log(f'{count} {product} {ftime(self.automation_times[product])} ({requirements[product]} @ {count} * {recipes[product]["rate"]}/min)', level)
+        log(f'Total automation time {ftime(self.automation_time)}', level)
+        log(f'{self.constructor_count} constructors', level)
+        log(f'{self.machine_count} machines', level)
+
+    @profiled('evaluate_solution_time')
+    def evaluate_solution_time(self, constraints):
+        products = self.products
+        handcrafted = self.machine_array == 0
+        automated = ~handcrafted
+        # handcrafted products get a placeholder machine count so that the automated formula never divides by zero.
+        machine_counts = np.where(handcrafted, 1, self.machine_array)
+        handcrafting_times = np.ceil(products.quantities / products.produced * products.build_steps * 0.45)
+        automation_times = np.ceil(60.0 * products.quantities / (machine_counts * np.minimum(constraints.conveyor_speed, products.rates)))
+
+        self.handcrafting_time_array = np.where(handcrafted, handcrafting_times, 0).astype(np.int64)
+        self.handcrafting_production_array = np.where(handcrafted, products.quantities, 0.0)
+        self.automation_time_array = np.where(automated, automation_times, 0).astype(np.int64)
+        self.automation_production_array = np.where(automated, products.quantities, 0.0)
+        self.handcrafting_order = [products.names[i] for i in np.flatnonzero(handcrafted)]
+        self.automation_tree = MaxSegmentTree(self.automation_time_array)
+        self.handcrafting_time = int(self.handcrafting_time_array.sum())
+        self.automation_time = self.automation_tree.max()
+        self.total_time = max(self.handcrafting_time, self.automation_time)
+
+    def product_state(self, i):
+        return (
+            self.machine_array[i],
+            self.automation_time_array[i],
+            self.automation_production_array[i],
+            self.handcrafting_time_array[i],
+            self.handcrafting_production_array[i],
+        )
 
+    def update_product(self, i, machine_count, automation_time, automation_production, handcrafting_time, handcrafting_production):
+        # overwrite one product's entries, keeping the counts, the manual time total and the automation max current.
+        machine_delta = machine_count - self.machine_array[i]
+        self.machine_count += int(machine_delta)
+        if self.products.constructors[i]:
+            self.constructor_count += int(machine_delta)
+        self.handcrafting_time += int(handcrafting_time - self.handcrafting_time_array[i])
+        self.machine_array[i] = machine_count
+        self.automation_time_array[i] = automation_time
+        self.automation_production_array[i] = automation_production
+        self.handcrafting_time_array[i] = handcrafting_time
+        self.handcrafting_production_array[i] = handcrafting_production
+        self.automation_tree.update(i, int(automation_time))
+        self.automation_time = self.automation_tree.max()
         self.total_time = max(self.handcrafting_time, self.automation_time)
 
-    def print_times(self):
-        log(f"Solution time ===> {ftime(self.total_time)}, automation {ftime(self.automation_time)}, manual {ftime(self.handcrafting_time)} <===")
+    @profiled('apply_delta')
+    def apply_delta(self, product, machine_delta, constraints):
+        # change one product's machine count and re-evaluate only that product, with the same result as calling
+        # evaluate_solution_time again. Only valid before any spare time has been allocated to handcrafting.
+        products = self.products
+        i = products.index[product]
+        quantity = products.quantities[i]
+        machine_count = self.machine_array[i] + machine_delta
+        if machine_count == 0:
+            if self.machine_array[i] != 0:
+                bisect.insort(self.handcrafting_order, product, key=products.index.__getitem__)
+            time = math.ceil(quantity / products.produced[i] * products.build_steps[i] * 0.45)
+            self.update_product(i, 0, 0, 0.0, time, quantity)
+        else:
+            if self.machine_array[i] == 0:
+                self.handcrafting_order.remove(product)
+            time = math.ceil(60.0 * quantity / (machine_count * min(constraints.conveyor_speed, products.rates[i])))
+            self.update_product(i, machine_count, time, quantity, 0, 0.0)
+
+    def print_times(self, level=LOG_ITERATION):
+        log(lambda: f"Solution time ===> {ftime(self.total_time)}, automation {ftime(self.automation_time)}, manual {ftime(self.handcrafting_time)} <===", level)
+
+
+SimulationResult = namedtuple(
+    'SimulationResult', ['makespan', 'complete', 'finish_times', 'machine_idle_times', 'handcrafting_idle_time', 'blocked', 'events']
+)
+
+
+def simulate(solution, constraints, horizon=math.inf, resolution=1.0):
+    # discrete-event playout of a solution, where machines and manual crafts wait for their ingredients. Waiting
+    # machines check their stock every resolution seconds (0: on every delivery). Returns a SimulationResult.
+    products = solution.products
+    names = products.names
+    count = len(products)
+    machines = solution.machine_array.tolist()
+    produced = products.produced.tolist()
+    rates = np.minimum(products.rates, constraints.conveyor_speed) if constraints.conveyor_speed else products.rates
+    cycle_times = (60.0 * products.produced / rates).tolist()
+    batches = [max(1, int(resolution // cycle_time)) for cycle_time in cycle_times]
+    craft_times = (0.45 * products.build_steps).tolist()
+    ingredients = []
+    consumers = [[] for _ in range(count)]
+    for i, product in enumerate(names):
+        needs = [(products.index[ingredient["name"]], ingredient["quantity"]) for ingredient in recipes[product].get("ingredients", []) if ingredient["name"] in products.index]
+        ingredients.append(needs)
+        if machines[i]:
+            for j, _ in needs:
+                consumers[j].append(i)
+
+    # whole crafts needed per product, consumers first: the demand left over once the consumers' (fractional)
+    # share is taken out of the quantity, plus what the consumers' rounded up crafts actually use.
+    quantities = products.quantities.tolist()
+    demand = list(quantities)
+    for i in range(count):
+        for j, quantity in ingredients[i]:
+            demand[j] -= quantities[i] / produced[i] * quantity
+    crafts_needed = [0] * count
+    for i in sorted(range(count), key=lambda i: -recipe_rank[names[i]]):
+        crafts_needed[i] = max(0, math.ceil(max(0.0, demand[i]) / produced[i] - 1e-9))
+        for j, quantity in ingredients[i]:
+            demand[j] += crafts_needed[i] * quantity
+
+    # split between machines and hand in the solution's proportions. Solvers that don't record a handcrafting
+    # order (FactorySolver2) get their handcrafted products queued ingredients first.
+    automation_production = solution.automation_production_array.tolist()
+    handcrafting_production = solution.handcrafting_production_array.tolist()
+    crafts_left = [0] * count
+    hand_crafts = [0] * count
+    for i in range(count):
+        if machines[i] == 0:
+            hand_crafts[i] = crafts_needed[i]
+        elif handcrafting_production[i] <= 0:
+            crafts_left[i] = crafts_needed[i]
+        else:
+            crafts_left[i] = min(math.ceil(automation_production[i] / produced[i] - 1e-9), crafts_needed[i])
+            hand_crafts[i] = crafts_needed[i] - crafts_left[i]
+    hand_order = [products.index[product] for product in solution.handcrafting_order]
+    ordered = set(hand_order)
+    hand_order.extend(sorted((i for i in range(count) if hand_crafts[i] and i not in ordered), key=lambda i: recipe_rank[names[i]]))
+    hand_queue = [[i, hand_crafts[i]] for i in hand_order if hand_crafts[i] > 0]
+
+    inventory = [0.0] * count
+    free = list(machines)
+    running = [0] * count
+    finish_times = [0.0] * count
+    idle = [0.0] * count
+    idle_since = [0.0] * count
+    events = []
+    sequence = 0
+    event_count = 0
+    hand_busy = False
+    hand_since = 0.0
+    hand_idle = 0.0
+    hand_position = 0
+    waiting = [False] * count
+
+    def start_machines(i, now):
+        # as many free machines as the stock allows start a craft (or a batch of crafts) together.
+        nonlocal sequence
+        left = crafts_left[i]
+        group = free[i] if free[i] < left else left
+        if group <= 0:
+            return
+        batch = batches[i]
+        crafts = group * batch if group * batch < left else left
+        for j, quantity in ingredients[i]:
+            available = int(inventory[j] // quantity)
+            if available < crafts:
+                crafts = available
+        if crafts <= 0:
+            return
+        group = -(-crafts // batch)
+        # idle machine-seconds accrue while machines wait with crafts still to do.
+        idle[i] += (free[i] if free[i] < left else left) * (now - idle_since[i])
+        idle_since[i] = now
+        for j, quantity in ingredients[i]:
+            inventory[j] -= crafts * quantity
+        free[i] -= group
+        crafts_left[i] -= crafts
+        running[i] += group
+        sequence += 1
+        heapq.heappush(events, (now + cycle_times[i] * -(-crafts // group), sequence, i, group, crafts))
+
+    def deliver(i, now):
+        # machines or ingredients became available for product i: its machines start at the next resolution tick.
+        nonlocal sequence
+        if not resolution:
+            start_machines(i, now)
+        elif not waiting[i] and free[i] and crafts_left[i]:
+            waiting[i] = True
+            sequence += 1
+            heapq.heappush(events, (math.ceil(now / resolution) * resolution, sequence, i, -1, 0))
+
+    def start_handcrafting(now):
+        # the first product in the queue that has its ingredients in stock gets one craft.
+        nonlocal sequence, hand_busy, hand_idle, hand_position
+        if hand_busy:
+            return
+        for position, (i, _) in enumerate(hand_queue):
+            if all(inventory[j] >= quantity for j, quantity in ingredients[i]):
+                break
+        else:
+            return
+        for j, quantity in ingredients[i]:
+            inventory[j] -= quantity
+        hand_idle += now - hand_since
+        hand_busy = True
+        hand_position = position
+        sequence += 1
+        heapq.heappush(events, (now + craft_times[i], sequence, i, 0, 1))
+
+    for i in range(count):
+        start_machines(i, 0.0)
+    start_handcrafting(0.0)
+
+    now = 0.0
+    while events and events[0][0] <= horizon:
+        now, _, i, group, crafts = heapq.heappop(events)
+        event_count += 1
+        if group < 0:
+            waiting[i] = False
+            start_machines(i, now)
+            continue
+        inventory[i] += crafts * produced[i]
+        finish_times[i] = now
+        if group:
+            left = crafts_left[i]
+            idle[i] += (free[i] if free[i] < left else left) * (now - idle_since[i])
+            idle_since[i] = now
+            free[i] += group
+            running[i] -= group
+            deliver(i, now)
+        else:
+            hand_busy = False
+            hand_since = now
+            hand_queue[hand_position][1] -= 1
+            if hand_queue[hand_position][1] == 0:
+                del hand_queue[hand_position]
+        for consumer in consumers[i]:
+            deliver(consumer, now)
+        start_handcrafting(now)
+
+    blocked = {names[i] for i in range(count) if crafts_left[i] > 0 or running[i] > 0}
+    blocked.update(names[i] for i, _ in hand_queue)
+    for i in range(count):
+        left = crafts_left[i]
+        idle[i] += (free[i] if free[i] < left else left) * (now - idle_since[i])
+    if hand_queue and not hand_busy:
+        hand_idle += now - hand_since
+    return SimulationResult(
+        makespan=now if blocked else max(finish_times, default=0.0),
+        complete=not blocked,
+        finish_times={names[i]: finish_times[i] for i in range(count)},
+        machine_idle_times={names[i]: idle[i] / machines[i] for i in range(count) if machines[i]},
+        handcrafting_idle_time=hand_idle,
+        blocked=blocked,
+        events=event_count,
+    )
+
+
+def log_simulation(result, level=LOG_SUMMARY):
+    if not log_enabled(level):
+        return
+    log('', level)
+    log(f"Simulated makespan {ftime(math.ceil(result.makespan))}{'' if result.complete else f' (unfinished: {sorted(result.blocked)})'}, {result.events} events", level)
+    for product, finish_time in result.finish_times.items():
+        idle_time = result.machine_idle_times.get(product)
+        log(f"{product} done at {ftime(math.ceil(finish_time))}" + ('' if idle_time is None else f", machines idle {ftime(math.ceil(idle_time))} each"), level)
+    log(f"Waiting to handcraft {ftime(math.ceil(result.handcrafting_idle_time))}", level)
+
+
+class AdditionBatch:
+    # every "+1 machine" move from a solution, evaluated in one vectorized step.
+    # a candidate only differs from the evaluated state of the current machines (before handcrafting optimization)
+    # in the added product's entries, so candidates are kept as deltas against it. Candidates left with spare manual
+    # time still go through optimize_handcrafting and are materialized as full solutions. Row -1 is the starting solution.
+    def __init__(self, solver, solution, evaluated, caps):
+        products = solver.products
+        constraints = solver.constraints
+        self.solver = solver
+        self.base = solution
+        self.evaluated = evaluated
+        self.rows = np.flatnonzero(solution.machine_array < caps)
+        self.solutions = {}
+
+        rows = self.rows
+        automation_times = self.evaluated.automation_time_array
+        self.automation = np.ceil(
+            60.0 * products.quantities[rows] / ((self.evaluated.machine_array[rows] + 1) * np.minimum(constraints.conveyor_speed, products.rates[rows]))
+        ).astype(np.int64)
+        self.handcrafting_time = self.evaluated.handcrafting_time - self.evaluated.handcrafting_time_array[rows]
+
+        # slowest automated product other than the one getting the machine: the two largest evaluated times cover every row.
+        slowest = int(np.argmax(automation_times)) if len(automation_times) else 0
+        runner_up = max(automation_times[:slowest].max(initial=0), automation_times[slowest + 1:].max(initial=0))
+        others = np.where(rows == slowest, runner_up, automation_times.max(initial=0))
+        automation_time = np.maximum(others, self.automation)
+        self.total_time = np.maximum(self.handcrafting_time, automation_time)
+
+        # blockers are the automated products finishing exactly at the total time, with the added product's entry swapped in.
+        finishing = np.sort(automation_times[automation_times != 0])
+        previous = automation_times[rows]
+        self.blocker_count = np.searchsorted(finishing, self.total_time, 'right') - np.searchsorted(finishing, self.total_time, 'left')
+        self.blocker_count -= (previous == self.total_time) & (previous != 0)
+        self.blocker_count += (self.automation == self.total_time) & (self.automation != 0)
+        self.constructor_count = solution.constructor_count + products.constructors[rows]
+
+        for row in np.flatnonzero(self.handcrafting_time <= automation_time):
+            candidate_solution = self.solution(row)
+            self.total_time[row] = candidate_solution.total_time
+            self.handcrafting_time[row] = candidate_solution.handcrafting_time
+            self.blocker_count[row] = len(candidate_solution.blockers())
+        self.base_blocker_count = len(solution.blockers())
+
+    def solution(self, row):
+        if row not in self.solutions:
+            self.solutions[row] = self.solver.add_machine(self.evaluated, self.rows[row])
+        return self.solutions[row]
+
+    def total_time_of(self, row):
+        return self.base.total_time if row < 0 else self.total_time[row]
+
+    def handcrafting_time_of(self, row):
+        return self.base.handcrafting_time if row < 0 else self.handcrafting_time[row]
+
+    def blocker_count_of(self, row):
+        return self.base_blocker_count if row < 0 else self.blocker_count[row]
+
+    def constructor_count_of(self, row):
+        return self.base.constructor_count if row < 0 else self.constructor_count[row]
+
+    def automation_time_at(self, row, i):
+        if row < 0:
+            return self.base.automation_time_array[i]
+        if row in self.solutions:
+            return self.solutions[row].automation_time_array[i]
+        if self.rows[row] == i:
+            return self.automation[row]
+        return self.evaluated.automation_time_array[i]
+
+    def handcrafting_time_at(self, row, i):
+        if row < 0:
+            return self.base.handcrafting_time_array[i]
+        if row in self.solutions:
+            return self.solutions[row].handcrafting_time_array[i]
+        if self.rows[row] == i:
+            return 0
+        return self.evaluated.handcrafting_time_array[i]
+
+    def is_blocker(self, row, i):
+        automation_time = self.automation_time_at(row, i)
+        return automation_time != 0 and automation_time == self.total_time_of(row)
 
 
 class FactorySolverBase:
-    constraints = FactoryConstraints()
-    requirements = {}
+    # score all candidate moves of an iteration at once instead of copying and evaluating each one in turn.
+    batched = True
+    # constraints the solver divides by, which check_constraints requires to be positive.
+    divides_by = ()
+
+    def __init__(self):
+        self.constraints = FactoryConstraints()
+        self.requirements = {}
+        self.products = None
+        self.stats = None
+        self.project_name = ''
+        self.cache = None
+
+    def reported(self, solution, previous):
+        # report_results lists the first solution and every one that is faster than the one before with more constructors.
+        return previous is None or (solution.constructor_count > previous.constructor_count and solution.total_time < previous.total_time)
 
     def report_results(self, solutions):
+        if not log_enabled(LOG_SUMMARY):
+            return
         log("")
         log("Best times per constructor count:")
-        for index, solution in enumerate(solutions):
-            if index == 0 or (solution.constructor_count > solutions[index - 1].constructor_count and solution.total_time < solutions[index - 1].total_time):
-                constructor_counts = {name: count for name, count in solution.machines.items() if recipes[name]["building"] == "Constructor" and count > 0}
-                handcrafting_times = {f"{name}: {ftime(time)}" for name, time in solution.handcrafting_times.items()}
-                log(f"{solution.constructor_count} machines: {ftime(solution.total_time)} hand {ftime(solution.handcrafting_time)} " f"{constructor_counts} {handcrafting_times}")
+        previous = None
+        for solution in solutions:
+            if self.reported(solution, previous):
+                self.log_reported(solution)
+            previous = solution
 
-    def optimize_machines(self, project_name, constraints):
+    def log_reported(self, solution):
+        if not log_enabled(LOG_SUMMARY):
+            return
+        constructor_counts = {name: count for name, count in solution.machines.items() if recipes[name]["building"] == "Constructor" and count > 0}
+        handcrafting_times = {f"{name}: {ftime(time)}" for name, time in solution.handcrafting_times.items()}
+        log(f"{solution.constructor_count} machines: {ftime(solution.total_time)} hand {ftime(solution.handcrafting_time)} " f"{constructor_counts} {handcrafting_times}")
+
+    def check_constraints(self, constraints):
+        # a non-positive constraint this solver divides by would come out as garbage machine counts.
+        for field in self.divides_by:
+            value = getattr(constraints, field)
+            if value <= 0:
+                raise ValueError(f'{field} must be positive, got {value}')
+
+    def prepare(self, project_name, constraints):
+        self.check_constraints(constraints)
         log('')
         log(f"Computing optimal machine configuration for {project_name}")
         self.constraints = constraints
+        self.project_name = project_name
         project = projects[project_name]
         gather_project_requirements(project, self.requirements)
+        self.products = ProductIndex(self.requirements)
+        trace('prepare', LOG_SUMMARY, project=project_name, max_time=constraints.max_time, conveyor_speed=constraints.conveyor_speed,
+              max_buildings=constraints.max_buildings, requirements=self.requirements)
+
+        if log_enabled(LOG_SUMMARY):
+            log(f"Requires:")
+            for product, quantity in self.requirements.items():
+                log(f"{quantity:.0f} {product}")
+
+    def optimize_machines(self, project_name, constraints):
+        self.prepare(project_name, constraints)
+        if self.cache is None:
+            return self.solve()
+
+        key = self.cache_key()
+        solutions = self.cache.get(key, self.products)
+        if solutions is not None:
+            log(f'Using cached solutions ({key[:12]})')
+            return solutions
+        solutions = self.solve()
+        self.cache.put(key, solutions)
+        return solutions
+
+    def iterate_machines(self, project_name, constraints):
+        # optimize_machines as a generator of every iteration's solution, as soon as it is found. Nothing is cached
+        # and the trajectory isn't kept: hold on to the solutions you need.
+        self.prepare(project_name, constraints)
+        return self.iterate()
+
+    def stream_machines(self, project_name, constraints, sinks, retain=False):
+        # writes a solution_record of every iteration to each of the sinks as the solve goes. Returns the final
+        # solution, or the whole trajectory with retain. The solutions report_results would list are logged as they
+        # come, so only the previous solution is held on to.
+        solutions = []
+        solution = previous = None
+        iterations = self.iterate_machines(project_name, constraints)
+        if log_enabled(LOG_SUMMARY):
+            log("")
+            log("Best times per constructor count:")
+        for iteration, solution in enumerate(iterations):
+            record = solution_record(solution, project=project_name, solver=type(self).__name__, iteration=iteration)
+            for sink in sinks:
+                sink.write(record)
+            if retain:
+                solutions.append(solution)
+            if self.reported(solution, previous):
+                self.log_reported(solution)
+            previous = solution
+        for sink in sinks:
+            sink.flush()
+        return solutions if retain else solution
+
+    def cache_parameters(self):
+        # solver settings that can change the solutions, on top of the solver class. batched isn't one: the batched
+        # and the sequential searches pick the same winners.
+        return {}
+
+    def search_batched(self):
+        # the batched searches don't log the candidates one by one, so a log at LOG_CANDIDATE goes through the
+        # sequential searches, which pick the same winners.
+        return self.batched and not log_enabled(LOG_CANDIDATE)
+
+    def cache_key(self):
+        # content hash of everything the solve depends on: the recipes of every product in the requirement closure,
+        # the project's requirements, the constraints and the solver. Recipes outside the closure don't take part,
+        # so editing one only invalidates the projects that need it.
+        constraints = self.constraints
+        content = {
+            'version': CACHE_VERSION,
+            'solver': type(self).__name__,
+            'parameters': self.cache_parameters(),
+            'requirements': projects[self.project_name]['requirements'],
+            'recipes': [recipes[product] for product in sorted(self.requirements)],
+            'conveyor_speed': constraints.conveyor_speed,
+            'max_time': constraints.max_time,
+            'max_buildings': sorted((product, cap) for product, cap in constraints.max_buildings.items() if product in self.requirements),
+        }
+        encoded = json.dumps(content, sort_keys=True, separators=(',', ':'), default=trace_value)
+        return hashlib.sha256(encoded.encode()).hexdigest()
 
-        log(f"Requires:")
-        for product, quantity in self.requirements.items():
-            log(f"{quantity:.0f} {product}")
-        self.solve()
+    def profile_machines(self, project_name, constraints, cprofile=False, memory=False, profile_limit=30):
+        # optimize_machines with the per-phase timers and counters switched on. Returns the solutions along with a
+        # SolverStats, which is also kept as self.stats. cprofile adds the profile_limit most expensive functions by
+        # cumulative time, memory adds the current and peak memory traced by tracemalloc and the top allocation sites.
+        global profile_stats
+        stats = SolverStats(type(self).__name__, project_name)
+        previous_stats = profile_stats
+        profiler = cProfile.Profile() if cprofile else None
+        tracing = memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        profile_stats = stats
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                self.prepare(project_name, constraints)
+                solutions = self.solve()
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        finally:
+            stats.seconds = time.perf_counter() - start
+            profile_stats = previous_stats
+            if memory:
+                current, peak = tracemalloc.get_traced_memory()
+                top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+                stats.memory = {'current': current, 'peak': peak, 'top': [{'location': str(entry.traceback), 'size': entry.size, 'count': entry.count} for entry in top]}
+                if tracing:
+                    tracemalloc.stop()
+
+        if profiler is not None:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(profile_limit)
+            stats.profile = output.getvalue()
+        stats.count('solutions', len(solutions))
+        self.stats = stats
+
+        if log_enabled(LOG_SUMMARY):
+            log('')
+            log('Profile:')
+            log(stats.summary())
+        trace('profile', LOG_SUMMARY, **stats.as_dict())
+        return solutions, stats
 
     def solve(self):
         raise NotImplementedError()
 
+    def iterate(self):
+        # solvers that can hand out their iterations as they go override this.
+        yield from self.solve()
+
+    def resolve(self, solutions, constraints=None, requirement_changes=None):
+        # warm start after a small change: solutions is this solver's last trajectory, constraints the new
+        # constraints and requirement_changes maps products to the quantity added to (or removed from) the project's
+        # requirements. The leading solutions that the change can't affect are carried over and the solve continues
+        # from there, with the same result as solving the changed problem from scratch. A max_time change is only
+        # supported by FactorySolver2 as a cold solve (see its valid_prefix). The solver is left untouched if the
+        # change is rejected.
+        previous_constraints = self.constraints
+        previous_products = self.products
+        if constraints is not None:
+            self.check_constraints(constraints)
+        requirements = dict(self.requirements)
+        for product, quantity in (requirement_changes or {}).items():
+            requirements[product] = requirements.get(product, 0) + quantity
+            add_ingredients(product, quantity, requirements)
+        if any(quantity < 0 for quantity in requirements.values()):
+            raise ValueError(f'Requirement changes {requirement_changes} leave negative requirements')
+        if constraints is not None:
+            self.constraints = constraints
+        self.requirements = requirements
+        self.products = ProductIndex(self.requirements)
+
+        prefix = 0
+        if solutions and self.products.names == previous_products.names:
+            changed = np.flatnonzero(self.products.quantities != previous_products.quantities)
+            prefix = self.valid_prefix(solutions, previous_constraints, changed)
+        log(f'Warm start: reusing {prefix} of {len(solutions)} solutions')
+        count('reused_solutions', prefix)
+        if prefix == 0:
+            return self.solve()
+        trajectory = self.carry_over(solutions[:prefix], changed)
+        if prefix == len(solutions):
+            trace_solution('solved', trajectory[-1], LOG_SUMMARY)
+            return trajectory
+        return self.solve(trajectory=trajectory)
+
+    def valid_prefix(self, solutions, previous_constraints, changed):
+        # how many leading solutions of the previous trajectory a solve under the current constraints and
+        # requirements would reproduce, given the indices of the products whose quantities changed.
+        return 0
+
+    def carry_over(self, solutions, changed):
+        # the reused solutions, on the current product data. Solvers whose valid_prefix accepts changed quantities
+        # also replace the changed products' entries.
+        return [copy.copy(solution) for solution in solutions]
+
 
 class FactorySolver(FactorySolverBase):
-    def solve(self):
+    divides_by = ('conveyor_speed',)
+
+    def initial_solution(self):
         # initial solution - start by hand crafting everything that is craftable
-        solution = FactorySolution()
-        for product in self.requirements.keys():
-            recipe = recipes[product]
-            if recipe.get("build_steps", 0) == 0:
-                solution.machines[product] = 1
+        solution = FactorySolution(self.products)
+        solution.machine_array[self.products.build_steps == 0] = 1
+        solution.evaluate_solution_time(self.constraints)
+        return solution
+
+    def solve(self, trajectory=None):
+        solutions = list(self.iterate(trajectory))
+        self.report_results(solutions)
+        return solutions
+
+    def iterate(self, trajectory=None):
+        # the solve as a generator: every iteration's solution as soon as it is found, only the latest one kept.
+        if trajectory:
+            # continue a carried over trajectory: only the machine counts matter to the evaluated state.
+            yield from trajectory
+            solution = trajectory[-1]
+            evaluated = FactorySolution(self.products)
+            evaluated.machine_array = solution.machine_array.copy()
+            evaluated.evaluate_solution_time(self.constraints)
+            # the counts are kept up by apply_delta from the initial solution, which doesn't count the raw resources.
+            evaluated.machine_count = solution.machine_count
+            evaluated.constructor_count = solution.constructor_count
+        else:
+            log("", LOG_ITERATION)
+            log("Evaluating initial solution:", LOG_ITERATION)
+            solution = self.initial_solution()
+            # candidates are re-evaluated from the machine counts alone, so keep that evaluated state around and update
+            # it one product at a time instead of re-evaluating every product for every candidate.
+            evaluated = copy.copy(solution)
+            solution = self.optimize_handcrafting(solution)
+            solution.print_times()
+            yield solution
+
+        while solution.total_time > 60 and solution.constructor_count < 200:
+            log("Starting iteration", LOG_ITERATION)
+            count('iterations')
+            if self.search_batched():
+                best_candidate, best_candidate_product = self.search_additions_batched(solution, evaluated)
             else:
-                solution.machines[product] = 0
+                best_candidate, best_candidate_product = self.search_additions(solution, evaluated)
 
-        log("")
-        log("Evaluating initial solution:")
-        solution.evaluate_solution_time(self.requirements, self.constraints)
-        solution = self.optimize_handcrafting(solution)
-        solution.print_times()
-
-        solutions = [solution]
-
-        while solutions[-1].total_time > 60 and solutions[-1].constructor_count < 200:
-            log("Starting iteration")
-            # try every product
-            best_candidate = copy.copy(solutions[-1])
-            best_candidate_product = ""
-            best_handcrafting_time_saved = 0
-            best_automation_time_saved = 0
-            for product in self.requirements.keys():
-                candidate_solution = copy.copy(solutions[-1])
-
-                if candidate_solution.machines[product] >= self.constraints.max_buildings.get(product, 1000):
-                    continue
+            log("", LOG_ITERATION)
+            log("Winning candidate:", LOG_ITERATION)
+            best_candidate.print_times()
+            solution = best_candidate
+            yield solution
+            if best_candidate_product != "":
+                trace_solution('iteration', best_candidate, product=best_candidate_product)
+                building = recipes[best_candidate_product]["building"]
+                log(lambda: f"Outcome: Adding one {building} ({best_candidate_product}), now {best_candidate.machines[best_candidate_product]} machines", LOG_ITERATION)
+                log("", LOG_ITERATION)
+                evaluated.apply_delta(best_candidate_product, 1, self.constraints)
+            else:
+                break
+
+        trace_solution('solved', solution, LOG_SUMMARY)
+
+    def valid_prefix(self, solutions, previous_constraints, changed):
+        # max_time doesn't take part in this solver. Any quantity or conveyor change can move every candidate's
+        # handcrafting, but a changed max_buildings cap only matters to the iterations where the product's machine
+        # count lies between the old and the new cap: elsewhere it is a candidate under both caps, or under neither.
+        if len(changed) or self.constraints.conveyor_speed != previous_constraints.conveyor_speed:
+            return 0
+        bounds = []
+        for product in set(self.constraints.max_buildings) | set(previous_constraints.max_buildings):
+            old_cap = previous_constraints.max_buildings.get(product, 1000)
+            new_cap = self.constraints.max_buildings.get(product, 1000)
+            if old_cap != new_cap and product in self.products.index:
+                bounds.append((self.products.index[product], min(old_cap, new_cap), max(old_cap, new_cap)))
+        for step in range(1, len(solutions)):
+            machines = solutions[step - 1].machine_array
+            if any(low <= machines[i] < high for i, low, high in bounds):
+                return step
+        return len(solutions)
 
-                candidate_solution.machines[product] += 1
-                candidate_solution.machine_count += 1
-                if recipes[product]["building"] == "Constructor":
-                    candidate_solution.constructor_count += 1
+    def add_machine(self, evaluated, i):
+        candidate_solution = copy.copy(evaluated)
+        candidate_solution.apply_delta(self.products.names[i], 1, self.constraints)
+        return self.optimize_handcrafting(candidate_solution)
 
-                log("")
-                log(f"Candidate solution: {product}, {candidate_solution.machines[product]} machines")
+    @profiled('search')
+    def search_additions(self, solution, evaluated):
+        # try every product, adding its machine to the evaluated state in place and taking it back out afterwards.
+        products = self.products
+        best_candidate = copy.copy(solution)
+        best_candidate_product = ""
+        best_handcrafting_time_saved = 0
+        best_automation_time_saved = 0
+        for i, product in enumerate(products.names):
+            if solution.machine_array[i] >= self.constraints.max_buildings.get(product, 1000):
+                continue
 
-                candidate_solution.evaluate_solution_time(self.requirements, self.constraints)
-                candidate_solution = self.optimize_handcrafting(candidate_solution)
+            log("", LOG_CANDIDATE)
+            log(lambda: f"Candidate solution: {product}, {solution.machine_array[i] + 1} machines", LOG_CANDIDATE)
+            count('candidates')
+            evaluated.apply_delta(product, 1, self.constraints)
+            candidate_solution = self.optimize_handcrafting(evaluated)
 
-                blockers = set()
-                best_blockers = set()
-                for prod, value in candidate_solution.automation_times.items():
-                    if value == candidate_solution.total_time:
-                        blockers |= {prod}
-                for prod, value in best_candidate.automation_times.items():
-                    if value == best_candidate.total_time:
-                        best_blockers |= {prod}
+            blockers = candidate_solution.blockers()
+            best_blockers = best_candidate.blockers()
 
-                candidate_solution.print_times()
-                handcrafting_delta = best_candidate.handcrafting_times.get(product, 0) - candidate_solution.handcrafting_times.get(product, 0)
+            if log_enabled(LOG_CANDIDATE):
+                candidate_solution.print_times(LOG_CANDIDATE)
+                handcrafting_delta = best_candidate.handcrafting_time_array[i] - candidate_solution.handcrafting_time_array[i]
                 log(
-                    f"Time delta {product} automation {ftime(best_candidate.automation_times.get(product, 0))} -> "
-                    f"{ftime(candidate_solution.automation_times[product])} "
-                    f"manual {ftime(best_candidate.handcrafting_times.get(product, 0))} -> "
-                    f"{ftime(candidate_solution.handcrafting_times.get(product, 0))} ({ftime(handcrafting_delta)} saved)"
+                    f"Time delta {product} automation {ftime(best_candidate.automation_time_array[i])} -> "
+                    f"{ftime(candidate_solution.automation_time_array[i])} "
+                    f"manual {ftime(best_candidate.handcrafting_time_array[i])} -> "
+                    f"{ftime(candidate_solution.handcrafting_time_array[i])} ({ftime(handcrafting_delta)} saved)",
+                    LOG_CANDIDATE,
                 )
-                log(f"Blockers: {blockers}")
-                handcrafted_products = [(product, ftime(candidate_solution.handcrafting_times[product])) for product in candidate_solution.handcrafting_order]
-                log(f"Handcrafting: {handcrafted_products}.")
-                better = False
-                reason = ""
-                if candidate_solution.total_time < best_candidate.total_time:
+                log(f"Blockers: {blockers}", LOG_CANDIDATE)
+                handcrafted_products = [(name, ftime(candidate_solution.handcrafting_times[name])) for name in candidate_solution.handcrafting_order]
+                log(f"Handcrafting: {handcrafted_products}.", LOG_CANDIDATE)
+                trace_solution('candidate', candidate_solution, LOG_CANDIDATE, product=product, blockers=blockers)
+            better = False
+            reason = ""
+            if candidate_solution.total_time < best_candidate.total_time:
+                better = True
+                reason = f"shorter time {ftime(candidate_solution.total_time)} vs {ftime(best_candidate.total_time)}"
+            elif candidate_solution.total_time == best_candidate.total_time:
+                # in case of identical times, go for the option with fewer blockers, but only if the product we're choosing is one of the blockers.
+                if product in best_blockers and not best_candidate_product in best_blockers:
                     better = True
-                    reason = f"shorter time {ftime(candidate_solution.total_time)} vs {ftime(best_candidate.total_time)}"
-                elif candidate_solution.total_time == best_candidate.total_time:
-                    # in case of identical times, go for the option with fewer blockers, but only if the product we're choosing is one of the blockers.
-                    if product in best_blockers and not best_candidate_product in best_blockers:
+                    reason = f"fewer blockers ({blockers} vs {best_blockers}"
+                elif len(blockers) == len(best_blockers):
+                    # if the blockers are the same then go for the option that is more efficient in terms of handcrafting time.
+                    if candidate_solution.handcrafting_time < best_candidate.handcrafting_time:
                         better = True
-                        reason = f"fewer blockers ({blockers} vs {best_blockers}"
-                    elif len(blockers) == len(best_blockers):
-                        # if the blockers are the same then go for the option that is more efficient in terms of handcrafting time.
-                        if candidate_solution.handcrafting_time < best_candidate.handcrafting_time:
+                        reason = f"shorter handcrafting ({ftime(candidate_solution.handcrafting_time)} vs {ftime(best_candidate.handcrafting_time)})"
+                    elif candidate_solution.handcrafting_time == best_candidate.handcrafting_time:
+                        handcrafting_time_saved = best_candidate.handcrafting_time_array[i] - candidate_solution.handcrafting_time_array[i]
+                        if handcrafting_time_saved > best_handcrafting_time_saved:
                             better = True
-                            reason = f"shorter handcrafting ({ftime(candidate_solution.handcrafting_time)} vs {ftime(best_candidate.handcrafting_time)})"
-                        elif candidate_solution.handcrafting_time == best_candidate.handcrafting_time:
-                            handcrafting_time_saved = best_candidate.handcrafting_times.get(product, 0) - candidate_solution.handcrafting_times.get(product, 0)
-                            if handcrafting_time_saved > best_handcrafting_time_saved:
+                            reason = f"more handcraft time saved {ftime(handcrafting_time_saved)} vs {ftime(best_handcrafting_time_saved)})"
+                        elif handcrafting_time_saved == best_handcrafting_time_saved:
+                            automation_time_saved = best_candidate.automation_time_array[i] - candidate_solution.automation_time_array[i]
+                            if automation_time_saved > best_automation_time_saved:
                                 better = True
-                                reason = f"more handcraft time saved {ftime(handcrafting_time_saved)} vs {ftime(best_handcrafting_time_saved)})"
-                            elif handcrafting_time_saved == best_handcrafting_time_saved:
-                                automation_time_saved = best_candidate.automation_times.get(product, 0) - candidate_solution.automation_times.get(product, 0)
-                                if automation_time_saved > best_automation_time_saved:
+                                reason = f"more automation time saved {ftime(automation_time_saved)} vs {ftime(best_automation_time_saved)})"
+                            elif automation_time_saved == best_automation_time_saved:
+                                if candidate_solution.constructor_count < best_candidate.constructor_count:
                                     better = True
-                                    reason = f"more automation time saved {ftime(automation_time_saved)} vs {ftime(best_automation_time_saved)})"
-                                elif automation_time_saved == best_automation_time_saved:
-                                    if candidate_solution.constructor_count < best_candidate.constructor_count:
-                                        better = True
-                                        reason = f"fewer constructors"
-                                    elif candidate_solution.constructor_count == best_candidate.constructor_count:
-                                        # if comparing to the previous step's solution, so clearly not better if it's just adding a machine with no effect.
-                                        if candidate_solution.machine_count == best_candidate.machine_count:
-                                            if best_candidate_product == "Concrete":
-                                                # better = True
-                                                reason = f"deprioritizing Concrete"
-                                            log(f"Candidate {product} is a tie")
+                                    reason = f"fewer constructors"
+                                elif candidate_solution.constructor_count == best_candidate.constructor_count:
+                                    # if comparing to the previous step's solution, so clearly not better if it's just adding a machine with no effect.
+                                    if candidate_solution.machine_count == best_candidate.machine_count:
+                                        if best_candidate_product == "Concrete":
+                                            # better = True
+                                            reason = f"deprioritizing Concrete"
+                                        log(lambda: f"Candidate {product} is a tie", LOG_CANDIDATE)
 
-                if better:
-                    log(f"Candidate {product} is better than previous solution because of {reason}")
-                    best_handcrafting_time_saved = best_candidate.handcrafting_times.get(product, 0) - candidate_solution.handcrafting_times.get(product, 0)
-                    best_automation_time_saved = best_candidate.automation_times.get(product, 0) - candidate_solution.automation_times.get(product, 0)
-                    best_candidate = candidate_solution
-                    best_candidate_product = product
+            if better:
+                log(lambda: f"Candidate {product} is better than previous solution because of {reason}", LOG_CANDIDATE)
+                best_handcrafting_time_saved = best_candidate.handcrafting_time_array[i] - candidate_solution.handcrafting_time_array[i]
+                best_automation_time_saved = best_candidate.automation_time_array[i] - candidate_solution.automation_time_array[i]
+                best_candidate = copy.copy(candidate_solution) if candidate_solution is evaluated else candidate_solution
+                best_candidate_product = product
 
-            log("")
-            log("Winning candidate:")
-            best_candidate.print_times()
-            solutions.append(best_candidate)
-            if best_candidate_product != "":
-                building = recipes[best_candidate_product]["building"]
-                log(f"Outcome: Adding one {building} ({best_candidate_product}), now {best_candidate.machines[best_candidate_product]} machines")
-                log("")
-            else:
-                break
+            evaluated.apply_delta(product, -1, self.constraints)
 
-        self.report_results(solutions)
-        return solutions
+        return best_candidate, best_candidate_product
 
-    def allocate_remaining_handcrafting_time(self, solution, product, requirements):
-        # handcraft for any remaining time
-        recipe = recipes[product]
-        leftover = solution.automation_time - solution.handcrafting_time
-        if leftover <= 0 or recipe.get("build_steps", 0) == 0 or solution.handcrafting_times.get(product, 0) > 0:
-            return
+    @profiled('search')
+    def search_additions_batched(self, solution, evaluated):
+        # same selection as search_additions, with every candidate scored up front by AdditionBatch.
+        # the tie-break rules compare each candidate against the best one so far (its blockers, the time saved
+        # relative to it), so they are folded over the precomputed keys in product order rather than sorted.
+        products = self.products
+        caps = np.array([self.constraints.max_buildings.get(product, 1000) for product in products.names])
+        batch = AdditionBatch(self, solution, evaluated, caps)
+        count('candidates', len(batch.rows))
+
+        best = -1
+        best_index = -1
+        best_handcrafting_time_saved = 0
+        best_automation_time_saved = 0
+        for row, i in enumerate(batch.rows):
+            total_time = batch.total_time[row]
+            best_total_time = batch.total_time_of(best)
+            better = False
+            if total_time < best_total_time:
+                better = True
+            elif total_time == best_total_time:
+                if batch.is_blocker(best, i) and (best_index < 0 or not batch.is_blocker(best, best_index)):
+                    better = True
+                elif batch.blocker_count[row] == batch.blocker_count_of(best):
+                    handcrafting_time = batch.handcrafting_time[row]
+                    best_handcrafting_time = batch.handcrafting_time_of(best)
+                    if handcrafting_time < best_handcrafting_time:
+                        better = True
+                    elif handcrafting_time == best_handcrafting_time:
+                        handcrafting_time_saved = batch.handcrafting_time_at(best, i) - batch.handcrafting_time_at(row, i)
+                        if handcrafting_time_saved > best_handcrafting_time_saved:
+                            better = True
+                        elif handcrafting_time_saved == best_handcrafting_time_saved:
+                            automation_time_saved = batch.automation_time_at(best, i) - batch.automation_time_at(row, i)
+                            if automation_time_saved > best_automation_time_saved:
+                                better = True
+                            elif automation_time_saved == best_automation_time_saved:
+                                better = batch.constructor_count[row] < batch.constructor_count_of(best)
 
-        already_produced = math.floor(solution.handcrafting_time * solution.machines[product] * recipe["rate"] / 60.0)
-        to_produce = requirements[product] - already_produced
+            if better:
+                best_handcrafting_time_saved = batch.handcrafting_time_at(best, i) - batch.handcrafting_time_at(row, i)
+                best_automation_time_saved = batch.automation_time_at(best, i) - batch.automation_time_at(row, i)
+                best = row
+                best_index = i
+
+        if best < 0:
+            return copy.copy(solution), ""
+        return batch.solution(best), products.names[best_index]
+
+    def handcrafting_time_needed(self, solution, i, handcrafting_time):
+        # time to finish product i by hand alongside its machines when handcrafting starts at handcrafting_time,
+        # and what the machines have made by then. None if there is nothing left to make.
+        products = self.products
+        rate = products.rates[i]
+        produced = products.produced[i]
+        build_steps = products.build_steps[i]
+        machine_count = solution.machine_array[i]
+        already_produced = math.floor(handcrafting_time * machine_count * rate / 60.0)
+        to_produce = products.quantities[i] - already_produced
         if to_produce <= 0:
-            return
+            return None, already_produced
 
         # n machines at speed s1 and 1 machine (hand craft) at speed s2
         # how much time t will it take to complete x products?
         # t(n * s1 + s2) = x
         # t = x / (n * s1 + s2)
-        time_spent_handcrafting = math.ceil(60.0 * to_produce / (solution.machines[product] * recipe["rate"] + recipe.get("produced", 1) * 60.0 / (0.45 * recipe["build_steps"])))
+        return math.ceil(60.0 * to_produce / (machine_count * rate + produced * 60.0 / (0.45 * build_steps))), already_produced
 
-        solution.automation_times[product] = solution.handcrafting_time + time_spent_handcrafting
-        solution.handcrafting_times[product] = time_spent_handcrafting
+    @profiled('allocate_remaining_handcrafting_time')
+    def allocate_remaining_handcrafting_time(self, solution, product, requirements):
+        # handcraft for any remaining time
+        products = self.products
+        i = products.index[product]
+        leftover = solution.automation_time - solution.handcrafting_time
+        if leftover <= 0 or products.build_steps[i] == 0 or solution.handcrafting_time_array[i] > 0:
+            return
+
+        time_spent_handcrafting, already_produced = self.handcrafting_time_needed(solution, i, solution.handcrafting_time)
+        if time_spent_handcrafting is None:
+            return
+
+        rate = products.rates[i]
+        machine_count = solution.machine_array[i]
+        solution.automation_time_array[i] = solution.handcrafting_time + time_spent_handcrafting
+        solution.automation_tree.update(i, solution.automation_time_array[i].item())
+        solution.handcrafting_time_array[i] = time_spent_handcrafting
         solution.handcrafting_time += time_spent_handcrafting
-        solution.automation_production[product] = math.floor(already_produced + time_spent_handcrafting / 60.0 * solution.machines[product] * recipe["rate"])
-        solution.handcrafting_production[product] = math.floor(recipe.get("produced", 1) * time_spent_handcrafting / (0.45 * recipe["build_steps"]))
+        solution.automation_production_array[i] = math.floor(already_produced + time_spent_handcrafting / 60.0 * machine_count * rate)
+        solution.handcrafting_production_array[i] = math.floor(products.produced[i] * time_spent_handcrafting / (0.45 * products.build_steps[i]))
 
-        solution.automation_time = 0
-        for time in solution.automation_times.values():
-            self.automation_time = max(time, solution.automation_time)
+        solution.automation_time = solution.automation_tree.max()
         solution.total_time = max(solution.automation_time, solution.handcrafting_time)
 
+    @profiled('optimize_handcrafting')
     def optimize_handcrafting(self, solution):
-        log(f"Initial handcrafting time {ftime(solution.handcrafting_time)}, automation time {ftime(solution.automation_time)}")
-        log(f"Crafting {solution.handcrafting_order}")
+        # spend the manual time left over while the machines run on finishing the slowest products by hand.
+        # handcrafting a product starting at time h finishes it at about (60 q + s h) / (n r + s) for n machines at
+        # rate r and a hand speed s: an increasing function of h that is below h exactly when the product's machines
+        # would be done by h anyway. So handcrafting anything but the current bottleneck can only add time, and of two
+        # products the slower one should go first. The best allocation is therefore a prefix of the products in
+        # decreasing automation time: the products are taken off a heap in that order, keeping the prefix with the
+        # shortest total time, which is only materialized at the end.
+        log(lambda: f"Initial handcrafting time {ftime(solution.handcrafting_time)}, automation time {ftime(solution.automation_time)}", LOG_CANDIDATE)
+        log(lambda: f"Crafting {solution.handcrafting_order}", LOG_CANDIDATE)
         if solution.handcrafting_time > solution.automation_time:
             return solution
 
-        # use up any left over hand crafting time until there is no left over time.
-        prev_solution = solution
-        while True:
-            # try handcrafting every possible product, choose the one with the best improvement
-            # classify products by the advantage that crafting offers vs. automation
-            # avoid going to a less advantgeous class if higher levered classes are available
-            candidate_products = []
-            best_ratio = 0.0
-            for product in prev_solution.machines.keys():
-                recipe = recipes[product]
-                if recipe.get("build_steps", 0) == 0:
-                    continue
-                if prev_solution.handcrafting_times.get(product, 0) > 0:
-                    continue
-                ratio = recipe.get("produced", 1) * 60.0 / (0.45 * recipe["build_steps"]) / recipe["rate"]
-                if abs(ratio - best_ratio) < 0.01:
-                    candidate_products.append(product)
-                elif ratio > best_ratio:
-                    candidate_products = [product]
-                    best_ratio = ratio
-
-            # for product in solution.machines.keys():
-            best_solution = prev_solution
-            for product in candidate_products:
-                candidate_solution = copy.copy(prev_solution)
-                candidate_solution.handcrafting_order.append(product)
-                self.allocate_remaining_handcrafting_time(candidate_solution, product, self.requirements)
-                if candidate_solution.total_time < best_solution.total_time:
-                    best_solution = candidate_solution
-
-            if best_solution != prev_solution:
-                best_product = best_solution.handcrafting_order[-1]
-                log(
-                    f"Hand crafting {best_product} for {ftime(best_solution.handcrafting_times[best_product])} "
-                    f"total time {ftime(best_solution.total_time)} vs {ftime(prev_solution.total_time)}, "
-                    f"manual time now {ftime(best_solution.handcrafting_time)}"
-                )
-                prev_solution = best_solution
-            else:
+        products = self.products
+        handcrafting_time = solution.handcrafting_time
+        # products done before the manual time already spent can't be the bottleneck of any prefix.
+        rows = np.flatnonzero(solution.automation_time_array > handcrafting_time)
+        heap = list(zip((-solution.automation_time_array[rows]).tolist(), rows.tolist()))
+        heapq.heapify(heap)
+
+        best_total_time = solution.total_time
+        plan = []
+        best_length = 0
+        while heap:
+            bottleneck, i = -heap[0][0], heap[0][1]
+            if bottleneck <= handcrafting_time or products.build_steps[i] == 0 or solution.handcrafting_time_array[i] > 0:
+                break
+            time_spent_handcrafting, _ = self.handcrafting_time_needed(solution, i, handcrafting_time)
+            if time_spent_handcrafting is None:
                 break
-        return prev_solution
+            heapq.heappop(heap)
+            handcrafting_time += time_spent_handcrafting
+            plan.append(i)
+            total_time = max(handcrafting_time, -heap[0][0] if heap else 0)
+            if total_time < best_total_time:
+                best_total_time = total_time
+                best_length = len(plan)
+
+        if best_length == 0:
+            return solution
+        best_solution = copy.copy(solution)
+        for i in plan[:best_length]:
+            product = products.names[i]
+            best_solution.handcrafting_order.append(product)
+            self.allocate_remaining_handcrafting_time(best_solution, product, self.requirements)
+            log(
+                lambda: f"Hand crafting {product} for {ftime(best_solution.handcrafting_times[product])}, "
+                f"manual time now {ftime(best_solution.handcrafting_time)}",
+                LOG_CANDIDATE,
+            )
+        log(lambda: f"Total time {ftime(best_solution.total_time)} vs {ftime(solution.total_time)}", LOG_CANDIDATE)
+        return best_solution
+
+
+FrontierPoint = namedtuple('FrontierPoint', ['machine_count', 'constructor_count', 'total_time', 'handcrafting_time', 'max_time', 'machines'])
+
+
+def dominates(a, b):
+    return (
+        a.machine_count <= b.machine_count
+        and a.constructor_count <= b.constructor_count
+        and a.total_time <= b.total_time
+        and a.handcrafting_time <= b.handcrafting_time
+        and a[:4] != b[:4]
+    )
+
+
+def non_dominated(values, block_size=1024):
+    # indices of the rows of values (one point per row, smaller is better in every column) that no other row
+    # dominates, in order; of identical rows only the first is kept. Compares a block of rows with all of them at once.
+    values = np.asarray(values, dtype=np.float64)
+    kept = []
+    for start in range(0, len(values), block_size):
+        block = values[start:start + block_size]
+        no_worse = (values[None, :, :] <= block[:, None, :]).all(axis=2)
+        equal = (values[None, :, :] == block[:, None, :]).all(axis=2)
+        dominated = (no_worse & ~equal).any(axis=1)
+        first = equal.argmax(axis=1) == np.arange(start, start + len(block))
+        kept.extend((np.flatnonzero(~dominated & first) + start).tolist())
+    return kept
+
 
 def handcrafting_efficiency(product):
     recipe = recipes[product]
     return recipe.get("produced", 1) * 60.0 / (0.45 * recipe["build_steps"]) / recipe["rate"]
 
 class FactorySolver2(FactorySolverBase):
-    
-    def solve(self):
+    # check every reduction against a simulated playout of the solution (see simulate) instead of the closed-form
+    # manual time alone, which ignores when ingredients arrive. Uses the batched search.
+    divides_by = ('max_time',)
+    simulate_candidates = False
+    simulation_resolution = 1.0
+
+    def cache_parameters(self):
+        return {'simulate_candidates': self.simulate_candidates, 'simulation_resolution': self.simulation_resolution}
+
+    def initial_solution(self):
         # initial solution - start by assigning as many machines as necessary to meet our constraints.
-        solution = FactorySolution()
+        products = self.products
+        max_time = self.constraints.max_time
+        solution = FactorySolution(products)
         solution.name = 'Start'
-        for product, quantity in self.requirements.items():
-            recipe = recipes[product]
-            solution.machines[product] = math.ceil(quantity / (recipe['rate'] * self.constraints.max_time / 60.0))
-            solution.automation_times[product] = math.ceil(60.0 * quantity / (solution.machines[product] * recipe['rate']))
-            solution.automation_production[product] = quantity
-            solution.handcrafting_times[product] = 0
-            solution.handcrafting_production[product] = 0
+        solution.machine_array = np.ceil(products.quantities / (products.rates * max_time / 60.0)).astype(np.int64)
+        solution.automation_time_array = np.ceil(60.0 * products.quantities / (solution.machine_array * products.rates)).astype(np.int64)
+        solution.automation_production_array = products.quantities.copy()
         solution.compute_derived_values()
-        solution.log_machines(self.requirements)
-        
-        solutions = [solution]
-        iteration_index = 1
+        return solution
+
+    def solve(self, initial_solution=None, trajectory=None):
+        return list(self.iterate(initial_solution, trajectory))
+
+    def iterate(self, initial_solution=None, trajectory=None):
+        # the solve as a generator: every iteration's solution as soon as it is found, only the latest one kept.
+        if trajectory:
+            yield from trajectory
+            solution = trajectory[-1]
+            iteration_index = len(trajectory)
+        else:
+            solution = initial_solution if initial_solution is not None else self.initial_solution()
+            solution.log_machines(self.requirements)
+            yield solution
+            iteration_index = 1
+
         while True:
-            best_candidate = solutions[-1]
+            best_candidate = solution
+            count('iterations')
             
-            log('')
-            log(f'==== Starting iteration {iteration_index} =====')
-            log(f'{best_candidate.machine_count} machines, {best_candidate.constructor_count} constructors')
-            log('Initial time:')
-            best_candidate.print_times()
+            if log_enabled(LOG_ITERATION):
+                log('', LOG_ITERATION)
+                log(f'==== Starting iteration {iteration_index} =====', LOG_ITERATION)
+                log(f'{best_candidate.machine_count} machines, {best_candidate.constructor_count} constructors', LOG_ITERATION)
+                log('Initial time:', LOG_ITERATION)
+                best_candidate.print_times()
             
-            for product, count in best_candidate.machines.items():
-                recipe = recipes[product]
-                if count == 0 or recipe.get('build_steps', 0) == 0:
-                    continue
-                
-                log('')
-                log(f'Evaluating {product}')
-                candidate_solution = copy.copy(solutions[-1])
-                candidate_solution.name = product
-                candidate_solution.automation_times[product] = self.constraints.max_time
-                candidate_solution.machines[product] -= 1
-                candidate_solution.automation_production[product] = math.floor(self.constraints.max_time * candidate_solution.machines[product] * recipe['rate'] / 60.0)
-                needed = math.ceil(self.requirements[product] - candidate_solution.automation_production[product])
-                time_to_craft = math.ceil(needed * 0.45 * recipe["build_steps"] / recipe.get("produced", 1))
-                log(f'Reducing machines from {candidate_solution.machines[product] + 1} to {candidate_solution.machines[product]}')
-                log(f'Excess {needed} items need to be manually produced in {ftime(time_to_craft)}, already producing {candidate_solution.handcrafting_production[product]} in {ftime(candidate_solution.handcrafting_times[product])}')
-                candidate_solution.handcrafting_times[product] = time_to_craft
-                candidate_solution.handcrafting_production[product] = needed
-                candidate_solution.compute_derived_values()
-                
-                log(f'Auto {ftime(best_candidate.automation_times[product])} -> {ftime(candidate_solution.automation_times[product])} '
-                    f'Manual {ftime(best_candidate.handcrafting_times[product])} -> {ftime(candidate_solution.handcrafting_times[product])}')
-                delta = candidate_solution.handcrafting_time - best_candidate.handcrafting_time
-                log(f'Total manual time {ftime(best_candidate.handcrafting_time)} -> {ftime(candidate_solution.handcrafting_time)} (delta {ftime(delta)})')                
-                
-                if candidate_solution.handcrafting_time > self.constraints.max_time:
-                    log(f'Manual time of {ftime(candidate_solution.handcrafting_time)} exceeds max constraint of {ftime(self.constraints.max_time)}')
-                else:
-                    better = False
-                    reason = ''
-                    if candidate_solution.machine_count < best_candidate.machine_count:
-                        better = True
-                        reason = 'fewer machines'
-                    elif candidate_solution.handcrafting_time < best_candidate.handcrafting_time:
-                        better = True
-                        reason = 'shorter time'
-                    elif candidate_solution.handcrafting_time == best_candidate.handcrafting_time:
-                        if handcrafting_efficiency(product) > handcrafting_efficiency(best_candidate.name):
-                            better = True
-                            reason ='better handcrafting efficiency'
-                        elif handcrafting_efficiency(product) == handcrafting_efficiency(best_candidate.name):
-                            log(f'{product} is tied with {best_candidate.name}')                       
-                     
-                    if better:   
-                        log(f'Candidate {product} is better than prior best candidate {best_candidate.name} because of {reason}')
-                        best_candidate = candidate_solution
-                    # ties?
-                    
-            if best_candidate != solutions[-1]:
-                log('')
-                log(f'OUTCOME: {best_candidate.name} is winning candidate')
-                log(f'Manual time {ftime(solutions[-1].handcrafting_time)} -> {ftime(best_candidate.handcrafting_time)}')
-                solutions.append(best_candidate)
+            if self.simulate_candidates or self.search_batched():
+                best_candidate = self.search_reductions_batched(solution)
+            else:
+                best_candidate = self.search_reductions(solution)
+
+            if best_candidate != solution:
+                if log_enabled(LOG_ITERATION):
+                    log('', LOG_ITERATION)
+                    log(f'OUTCOME: {best_candidate.name} is winning candidate', LOG_ITERATION)
+                    log(f'Manual time {ftime(solution.handcrafting_time)} -> {ftime(best_candidate.handcrafting_time)}', LOG_ITERATION)
+                    trace_solution('iteration', best_candidate, product=best_candidate.name)
+                solution = best_candidate
+                yield solution
             else:
-                log('No further improvement to solution.')
+                log('No further improvement to solution.', LOG_ITERATION)
                 break
             
             iteration_index += 1
-                
-                    
-def init():
-    log(f'Starting Satisfactory Solver @ {datetime.now()}')
-    log('Loading game data.')
-    with open("game_data.json") as f:
-        data = json.load(f)
+
+        trace_solution('solved', solution, LOG_SUMMARY)
+
+    def optimize_frontier(self, project_name, constraints, max_times):
+        # machines vs. completion time trade-off: the non-dominated (machine_count, constructor_count, total_time,
+        # handcrafting_time) points among the solutions of a solve at each of the time limits. The limits are solved
+        # together in one pass (see frontier_runs) with the same results as a solve per limit.
+        self.prepare(project_name, constraints)
+        limits = sorted(set(max_times))
+        for max_time in limits:
+            run_constraints = copy.copy(constraints)
+            run_constraints.max_time = max_time
+            self.check_constraints(run_constraints)
+        if self.simulate_candidates:
+            runs = []
+            for max_time in limits:
+                self.constraints = copy.copy(constraints)
+                self.constraints.max_time = max_time
+                runs.append([(solution.machine_count, solution.constructor_count, solution.total_time, solution.handcrafting_time, solution.name)
+                             for solution in self.solve()])
+            self.constraints = constraints
+        else:
+            runs = self.frontier_runs(limits)
+
+        candidates = []
+        for run, max_time in zip(runs, limits):
+            log(lambda: f'Max time {ftime(max_time)}: {len(run)} solutions', LOG_ITERATION)
+            for step, (machine_count, constructor_count, total_time, handcrafting_time, _) in enumerate(run):
+                candidates.append((FrontierPoint(machine_count, constructor_count, total_time, handcrafting_time, max_time, None), run, step))
+        # only the points that made it get their machines, replayed from their run's reductions.
+        products = self.products
+        frontier = []
+        for k in non_dominated([point[:4] for point, _, _ in candidates]):
+            point, run, step = candidates[k]
+            machines = np.ceil(products.quantities / (products.rates * point.max_time / 60.0)).astype(np.int64)
+            for _, _, _, _, product in run[1:step + 1]:
+                machines[products.index[product]] -= 1
+            frontier.append(point._replace(machines={products.names[i]: int(machines[i]) for i in np.flatnonzero(machines)}))
+        frontier.sort()
+        if log_enabled(LOG_SUMMARY):
+            log('')
+            log('Frontier:')
+            for point in frontier:
+                log(f'{point.machine_count} machines, {point.constructor_count} constructors: total {ftime(point.total_time)}, manual {ftime(point.handcrafting_time)}')
+                trace('frontier_point', LOG_SUMMARY, **point._asdict())
+        return frontier
+
+    @profiled('frontier_runs')
+    def frontier_runs(self, limits):
+        # the batched search at every time limit at once, on (limits x products) arrays: each iteration removes the
+        # best machine of every limit whose run hasn't finished. A run can't warm-start from a neighbouring limit, as
+        # a max_time change moves every product's manual times (see valid_prefix), but the limits share the
+        # iterations. Returns the (machine_count, constructor_count, total_time, handcrafting_time, reduced product)
+        # of every solution of each limit's run, as solve() would find them.
+        products = self.products
+        limits = np.array(limits, dtype=np.float64)[:, None]
+        machines = np.ceil(products.quantities / (products.rates * limits / 60.0)).astype(np.int64)
+        automation_times = np.ceil(60.0 * products.quantities / (machines * products.rates)).astype(np.int64)
+        handcrafting_times = np.zeros_like(machines)
+        handcrafting_time = np.zeros(len(limits), dtype=np.int64)
+        machine_count = machines.sum(axis=1)
+        constructor_count = machines[:, products.constructors].sum(axis=1)
+        automation_time = automation_times.max(axis=1, initial=0)
+        runs = [[(int(machine_count[k]), int(constructor_count[k]), int(automation_time[k]), 0, 'Start')] for k in range(len(limits))]
+
+        # least manual time first, then best handcrafting efficiency, then the earliest product.
+        rank = np.empty(len(products), dtype=np.int64)
+        rank[np.lexsort((np.arange(len(products)), -products.handcrafting_efficiencies))] = np.arange(len(products))
+        active = np.arange(len(limits))
+        while len(active):
+            count('iterations')
+            rows = machines[active]
+            automation_production = np.floor(limits[active] * (rows - 1) * products.rates / 60.0)
+            needed = np.ceil(products.quantities - automation_production)
+            time_to_craft = np.ceil(needed * 0.45 * products.build_steps / products.produced).astype(np.int64)
+            new_handcrafting_time = handcrafting_time[active, None] - handcrafting_times[active] + time_to_craft
+            candidates = (rows > 0) & (products.build_steps != 0)
+            count('candidates', int(candidates.sum()))
+            keys = np.where(candidates, new_handcrafting_time * len(products) + rank, np.iinfo(np.int64).max)
+            best = keys.argmin(axis=1)
+            ks = np.arange(len(active))
+            reduced = candidates[ks, best] & (new_handcrafting_time[ks, best] <= limits[active, 0])
+            time_to_craft = time_to_craft[ks, best][reduced]
+            active, best = active[reduced], best[reduced]
+
+            machines[active, best] -= 1
+            handcrafting_time[active] += time_to_craft - handcrafting_times[active, best]
+            handcrafting_times[active, best] = time_to_craft
+            automation_times[active, best] = limits[active, 0]
+            machine_count[active] -= 1
+            constructor_count[active] -= products.constructors[best]
+            automation_time[active] = automation_times[active].max(axis=1)
+            for k, i in zip(active.tolist(), best.tolist()):
+                runs[k].append((int(machine_count[k]), int(constructor_count[k]), int(max(automation_time[k], handcrafting_time[k])),
+                                int(handcrafting_time[k]), products.names[i]))
+        return runs
+
+    def valid_prefix(self, solutions, previous_constraints, changed):
+        # each iteration removes the machine whose reduction adds the least manual time (then best handcrafting
+        # efficiency, then the earliest product), among the reductions that keep manual time within max_time. A
+        # product's added manual time only depends on its own quantity and machine count, so an iteration of the
+        # previous run is still chosen as long as it doesn't reduce a changed product and beats the first reduction
+        # of every changed product, which stay at their starting machine counts until then.
+        # max_buildings and conveyor_speed don't take part in this solver (unless candidates are simulated). A max_time
+        # change is unsupported and always falls back to a cold solve: it moves every product's manual times from the
+        # first reduction on, so no prefix of the previous run is reproduced (benchmarked as resolve/max_time).
+        max_time = self.constraints.max_time
+        if max_time != previous_constraints.max_time or self.simulate_candidates:
+            return 0
+        products = self.products
+        start = self.initial_solution()
+        rows = changed[(start.machine_array[changed] > 0) & (products.build_steps[changed] != 0)]
+        changed_first = None
+        if len(rows):
+            automation_production = np.floor(max_time * (start.machine_array[rows] - 1) * products.rates[rows] / 60.0)
+            needed = np.ceil(products.quantities[rows] - automation_production)
+            added_times = np.ceil(needed * 0.45 * products.build_steps[rows] / products.produced[rows]).astype(np.int64) - start.handcrafting_time_array[rows]
+            first = np.lexsort((rows, -products.handcrafting_efficiencies[rows], added_times))[0]
+            changed_first = (added_times[first], -products.handcrafting_efficiencies[rows[first]], rows[first])
+        changed = set(changed.tolist())
+
+        for step in range(1, len(solutions)):
+            i = products.index[solutions[step].name]
+            previous_time = solutions[step - 1].handcrafting_time
+            added_time = solutions[step].handcrafting_time - previous_time
+            if i in changed:
+                return step
+            if changed_first is not None and previous_time + changed_first[0] <= max_time:
+                if (added_time, -products.handcrafting_efficiencies[i], i) > changed_first:
+                    return step
+        return len(solutions)
+
+    def carry_over(self, solutions, changed):
+        # changed products stay at their starting machine counts within a valid prefix, so the new starting solution
+        # is replayed with the previous run's reductions, one product per iteration, as a cold solve would.
+        carried = [self.initial_solution()]
+        for solution in solutions[1:]:
+            i = self.products.index[solution.name]
+            cpy = copy.copy(carried[-1])
+            cpy.name = solution.name
+            cpy.update_product(i, *solution.product_state(i))
+            carried.append(cpy)
+        return carried
+
+    def reduce_machine(self, solution, i):
+        # give up one machine and handcraft whatever the remaining machines can't produce in time.
+        products = self.products
+        max_time = self.constraints.max_time
+        machine_count = solution.machine_array[i] - 1
+        automation_production = math.floor(max_time * machine_count * products.rates[i] / 60.0)
+        needed = math.ceil(products.quantities[i] - automation_production)
+        time_to_craft = math.ceil(needed * 0.45 * products.build_steps[i] / products.produced[i])
+        solution.update_product(i, machine_count, max_time, automation_production, time_to_craft, needed)
+
+    def remove_machine(self, solution, i):
+        candidate_solution = copy.copy(solution)
+        candidate_solution.name = self.products.names[i]
+        self.reduce_machine(candidate_solution, i)
+        return candidate_solution
+
+    @profiled('search')
+    def search_reductions(self, solution):
+        # try every product, reducing it in place and restoring it afterwards; only the winner gets copied.
+        products = self.products
+        max_time = self.constraints.max_time
+        best_candidate = solution
+        for i, product in enumerate(products.names):
+            if solution.machine_array[i] == 0 or products.build_steps[i] == 0:
+                continue
+
+            log('', LOG_CANDIDATE)
+            log(lambda: f'Evaluating {product}', LOG_CANDIDATE)
+            count('candidates')
+            previous_state = solution.product_state(i)
+            best_automation_time = best_candidate.automation_time_array[i]
+            best_handcrafting_time = best_candidate.handcrafting_time_array[i]
+            best_total_handcrafting_time = best_candidate.handcrafting_time
+            best_machine_count = best_candidate.machine_count
+            self.reduce_machine(solution, i)
+            candidate_solution = solution
+
+            if log_enabled(LOG_CANDIDATE):
+                log(f'Reducing machines from {candidate_solution.machine_array[i] + 1} to {candidate_solution.machine_array[i]}', LOG_CANDIDATE)
+                log(f'Excess {candidate_solution.handcrafting_production_array[i]:.0f} items need to be manually produced in {ftime(candidate_solution.handcrafting_time_array[i])}, already producing {previous_state[4]:.0f} in {ftime(previous_state[3])}', LOG_CANDIDATE)
+
+                log(f'Auto {ftime(best_automation_time)} -> {ftime(candidate_solution.automation_time_array[i])} '
+                    f'Manual {ftime(best_handcrafting_time)} -> {ftime(candidate_solution.handcrafting_time_array[i])}', LOG_CANDIDATE)
+                delta = candidate_solution.handcrafting_time - best_total_handcrafting_time
+                log(f'Total manual time {ftime(best_total_handcrafting_time)} -> {ftime(candidate_solution.handcrafting_time)} (delta {ftime(delta)})', LOG_CANDIDATE)
+                trace_solution('candidate', candidate_solution, LOG_CANDIDATE, product=product, feasible=bool(candidate_solution.handcrafting_time <= max_time))
+
+            if candidate_solution.handcrafting_time > max_time:
+                log(lambda: f'Manual time of {ftime(candidate_solution.handcrafting_time)} exceeds max constraint of {ftime(max_time)}', LOG_CANDIDATE)
+            else:
+                better = False
+                reason = ''
+                if candidate_solution.machine_count < best_machine_count:
+                    better = True
+                    reason = 'fewer machines'
+                elif candidate_solution.handcrafting_time < best_total_handcrafting_time:
+                    better = True
+                    reason = 'shorter time'
+                elif candidate_solution.handcrafting_time == best_total_handcrafting_time:
+                    if handcrafting_efficiency(product) > handcrafting_efficiency(best_candidate.name):
+                        better = True
+                        reason ='better handcrafting efficiency'
+                    elif handcrafting_efficiency(product) == handcrafting_efficiency(best_candidate.name):
+                        log(lambda: f'{product} is tied with {best_candidate.name}', LOG_CANDIDATE)
+
+                if better:
+                    log(lambda: f'Candidate {product} is better than prior best candidate {best_candidate.name} because of {reason}', LOG_CANDIDATE)
+                    best_candidate = copy.copy(candidate_solution)
+                    best_candidate.name = product
+                # ties?
+
+            solution.update_product(i, *previous_state)
+
+        return best_candidate
+
+    @profiled('search')
+    def search_reductions_batched(self, solution):
+        # every "-1 machine" move at once. Only the reduced product's handcrafting time changes, so the new manual
+        # time of each candidate is a single vectorized delta against the current total.
+        products = self.products
+        max_time = self.constraints.max_time
+        rows = np.flatnonzero((solution.machine_array > 0) & (products.build_steps != 0))
+        automation_production = np.floor(max_time * (solution.machine_array[rows] - 1) * products.rates[rows] / 60.0)
+        needed = np.ceil(products.quantities[rows] - automation_production)
+        time_to_craft = np.ceil(needed * 0.45 * products.build_steps[rows] / products.produced[rows]).astype(np.int64)
+        handcrafting_time = solution.handcrafting_time - solution.handcrafting_time_array[rows] + time_to_craft
+        count('candidates', len(rows))
+
+        feasible = np.flatnonzero(handcrafting_time <= max_time)
+        if len(feasible) == 0:
+            return solution
+        # every candidate has one machine less than the current solution, so the sequential comparison reduces to
+        # least manual time, then best handcrafting efficiency, then the earliest product.
+        order = np.lexsort((feasible, -products.handcrafting_efficiencies[rows[feasible]], handcrafting_time[feasible]))
+        if not self.simulate_candidates:
+            return self.remove_machine(solution, rows[feasible[order[0]]])
+
+        # the best reduction whose simulated makespan stays within max_time, or within the current solution's
+        # makespan when ingredient delays already put that over.
+        limit = max(max_time, simulate(solution, self.constraints, resolution=self.simulation_resolution).makespan)
+        for k in order:
+            candidate = self.remove_machine(solution, rows[feasible[k]])
+            result = simulate(candidate, self.constraints, resolution=self.simulation_resolution)
+            count('simulations')
+            log(lambda: f'{candidate.name}: simulated makespan {ftime(math.ceil(result.makespan))}', LOG_CANDIDATE)
+            if result.complete and result.makespan <= limit:
+                return candidate
+        return solution
+
+
+class FactorySolverMILP(FactorySolverBase):
+    # exact counterpart of FactorySolver2: the fewest machines, then the least manual time, within max_time. method is
+    # 'dynamic' (exact DP), 'scipy' or 'branch_and_bound'; proven_optimal is False when the latter two stop early.
+    divides_by = ('max_time',)
+    method = 'dynamic'
+    time_limit = 60.0
+    node_limit = 200000
+    proven_optimal = True
+
+    def cache_parameters(self):
+        return {'method': self.method, 'time_limit': self.time_limit, 'node_limit': self.node_limit}
+
+    def solve(self):
+        products = self.products
+        self.proven_optimal = True
+        choices = self.machine_choices()
+        if any(len(machine_counts) == 0 for machine_counts, _ in choices):
+            blocked = [products.names[i] for i, (machine_counts, _) in enumerate(choices) if len(machine_counts) == 0]
+            log(f'No feasible configuration within {ftime(self.constraints.max_time)}: {blocked} cannot be produced in time')
+            return []
+
+        machines = None
+        if self.method == 'dynamic':
+            machines = self.solve_dynamic(choices)
+        elif self.method == 'scipy' and scipy_available:
+            machines = self.solve_scipy(choices)
+            if machines is None:
+                log('scipy MILP solve failed, falling back to branch-and-bound')
+                machines = self.solve_branch_and_bound(choices)
+        else:
+            if self.method == 'scipy':
+                log('scipy is not installed, falling back to branch-and-bound')
+            machines = self.solve_branch_and_bound(choices)
+        if machines is None:
+            log(f'No feasible configuration within {ftime(self.constraints.max_time)} of manual time')
+            return []
+
+        solution = self.build_solution(machines)
+        solution.log_machines(self.requirements)
+        log('')
+        log(f'MILP solution: {solution.machine_count} machines, manual time {ftime(solution.handcrafting_time)}' + ('' if self.proven_optimal else ' (stopped early, not proven optimal)'))
+        solution.print_times(LOG_SUMMARY)
+        trace_solution('solved', solution, LOG_SUMMARY, proven_optimal=self.proven_optimal)
+        return [solution]
+
+    def automation_rates(self):
+        rates = self.products.rates
+        if self.constraints.conveyor_speed:
+            rates = np.minimum(self.constraints.conveyor_speed, rates)
+        return rates
+
+    def handcrafting_needed(self, i, machine_count, rates):
+        automation_production = math.floor(self.constraints.max_time * machine_count * rates[i] / 60.0)
+        return max(0, math.ceil(self.products.quantities[i] - automation_production))
+
+    def handcrafting_time_for(self, i, needed):
+        products = self.products
+        return math.ceil(needed * 0.45 * products.build_steps[i] / products.produced[i])
+
+    def machine_choices(self):
+        # per product, every machine count worth considering (descending) and the manual time it leaves (ascending):
+        # from just enough machines to need no handcrafting, down to the fewest whose shortfall fits in max_time.
+        products = self.products
+        max_time = self.constraints.max_time
+        rates = self.automation_rates()
+        choices = []
+        for i, product in enumerate(products.names):
+            cap = self.constraints.max_buildings.get(product, 1000)
+            full = math.ceil(products.quantities[i] * 60.0 / (max_time * rates[i]))
+            while self.handcrafting_needed(i, full, rates) > 0:
+                full += 1
+            while full > 0 and self.handcrafting_needed(i, full - 1, rates) == 0:
+                full -= 1
+
+            machine_counts = []
+            handcrafting_times = []
+            if products.build_steps[i] == 0:
+                if full <= cap:
+                    machine_counts.append(full)
+                    handcrafting_times.append(0)
+            else:
+                for machine_count in range(min(cap, full), -1, -1):
+                    handcrafting_time = self.handcrafting_time_for(i, self.handcrafting_needed(i, machine_count, rates))
+                    if handcrafting_time > max_time:
+                        break
+                    machine_counts.append(machine_count)
+                    handcrafting_times.append(handcrafting_time)
+            choices.append((machine_counts, handcrafting_times))
+        return choices
+
+    def solve_dynamic(self, choices):
+        # multiple-choice knapsack over each product's machine counts, as in solve_branch_and_bound, solved exactly:
+        # cost[w] is the least cost of the products so far within w seconds of manual time, and picks remembers the
+        # choice behind every entry for walking back from the full budget. O(products * max_time * choices).
+        # manual times are whole seconds, so a fractional max_time allows no more than its floor.
+        max_time = math.floor(self.constraints.max_time)
+        machine_weight = max_time + 1
+        unreachable = np.iinfo(np.int64).max // 4
+        cost = np.zeros(max_time + 1, dtype=np.int64)
+        picks = np.zeros((len(choices), max_time + 1), dtype=np.min_scalar_type(max(len(machine_counts) for machine_counts, _ in choices)))
+        for k, (machine_counts, times) in enumerate(choices):
+            best = np.full(max_time + 1, unreachable, dtype=np.int64)
+            for j, (machine_count, time) in enumerate(zip(machine_counts, times)):
+                candidate = np.full(max_time + 1, unreachable, dtype=np.int64)
+                candidate[time:] = np.minimum(cost[:max_time + 1 - time] + (machine_weight * machine_count + time), unreachable)
+                better = candidate < best
+                best[better] = candidate[better]
+                picks[k, better] = j
+            cost = best
+        if cost[max_time] >= unreachable:
+            return None
+
+        machines = np.zeros(len(choices), dtype=np.int64)
+        budget = max_time
+        for k in range(len(choices) - 1, -1, -1):
+            j = picks[k, budget]
+            machines[k] = choices[k][0][j]
+            budget -= choices[k][1][j]
+        return machines
+
+    def solve_scipy(self, choices):
+        import scipy.sparse
+        from scipy.optimize import Bounds, LinearConstraint, milp
+
+        products = self.products
+        count = len(products)
+        max_time = self.constraints.max_time
+        rates = self.automation_rates()
+        quantities = np.ceil(products.quantities)
+        # variables: machines, then items crafted by hand, then seconds spent handcrafting. Machines weigh more than
+        # the whole manual time budget so that the objective minimizes machines first.
+        objective = np.concatenate([np.full(count, max_time + 1.0), np.zeros(count), np.ones(count)])
+        lower = np.concatenate([[machine_counts[-1] for machine_counts, _ in choices], np.zeros(2 * count)])
+        upper = np.concatenate([
+            [machine_counts[0] for machine_counts, _ in choices],
+            np.where(products.build_steps != 0, quantities, 0),
+            np.full(count, max_time),
+        ])
+        identity = scipy.sparse.identity(count)
+        coverage = scipy.sparse.hstack([scipy.sparse.diags(max_time * rates / 60.0), identity, scipy.sparse.csr_matrix((count, count))])
+        crafting = scipy.sparse.hstack([scipy.sparse.csr_matrix((count, count)), scipy.sparse.diags(-0.45 * products.build_steps / products.produced), identity])
+        budget = scipy.sparse.hstack([scipy.sparse.csr_matrix((1, 2 * count)), scipy.sparse.csr_matrix(np.ones((1, count)))])
+        constraints = LinearConstraint(
+            scipy.sparse.vstack([coverage, crafting, budget]).tocsr(),
+            np.concatenate([quantities, np.zeros(count), [0]]),
+            np.concatenate([np.full(2 * count, np.inf), [max_time]]),
+        )
+        result = milp(objective, integrality=np.ones(3 * count), bounds=Bounds(lower, upper), constraints=constraints, options={'time_limit': self.time_limit})
+        if result.x is None:
+            return None
+        # status 1: stopped at the time limit with a feasible solution.
+        self.proven_optimal = result.status == 0
+
+        machines = np.round(result.x[:count]).astype(np.int64)
+        # the LP works in floating point; re-derive the manual time with the solvers' own rounding before trusting it.
+        handcrafting_time = sum(self.handcrafting_time_for(i, self.handcrafting_needed(i, machines[i], rates)) for i in range(count))
+        if handcrafting_time > max_time:
+            return None
+        return machines
+
+    def solve_branch_and_bound(self, choices):
+        # multiple-choice knapsack over each product's machine counts: cost is machines (weighted above any manual
+        # time) plus manual time, weight is manual time, capacity is max_time. The LP relaxation of a node is solved
+        # greedily on the lower convex hull of each product's choices; branching splits the machine range of the
+        # product the relaxation takes fractionally.
+        max_time = self.constraints.max_time
+        machine_weight = max_time + 1
+        costs = [[machine_weight * machine_count + time for machine_count, time in zip(*choice)] for choice in choices]
+
+        def hull(k, lo, hi):
+            machine_counts, times = choices[k]
+            points = []
+            for j, machine_count in enumerate(machine_counts):
+                if machine_count > hi or machine_count < lo:
+                    continue
+                while points and times[points[-1]] == times[j]:
+                    points.pop()
+                while len(points) >= 2:
+                    a, b = points[-2], points[-1]
+                    cross = (times[b] - times[a]) * (costs[k][j] - costs[k][a]) - (costs[k][b] - costs[k][a]) * (times[j] - times[a])
+                    if cross > 0:
+                        break
+                    points.pop()
+                points.append(j)
+            return points
+
+        def increments(k, points):
+            steps = []
+            for position, (a, b) in enumerate(zip(points, points[1:])):
+                weight = choices[k][1][b] - choices[k][1][a]
+                gain = costs[k][a] - costs[k][b]
+                steps.append((-gain / weight, k, position, weight, -gain))
+            return steps
+
+        base_hulls = [hull(k, 0, math.inf) for k in range(len(choices))]
+        base_increments = sorted(step for k, points in enumerate(base_hulls) for step in increments(k, points))
+
+        def relax(ranges):
+            hulls = base_hulls
+            steps = base_increments
+            if ranges:
+                hulls = list(base_hulls)
+                for k, (lo, hi) in ranges.items():
+                    hulls[k] = hull(k, lo, hi)
+                    if not hulls[k]:
+                        return None
+                steps = sorted([step for step in base_increments if step[1] not in ranges] + [step for k in ranges for step in increments(k, hulls[k])])
+
+            levels = [0] * len(hulls)
+            cost = sum(costs[k][points[0]] for k, points in enumerate(hulls))
+            used = sum(choices[k][1][points[0]] for k, points in enumerate(hulls))
+            if used > max_time:
+                return None
+            for _, k, position, weight, delta in steps:
+                if used + weight > max_time:
+                    bound = cost + delta * (max_time - used) / weight
+                    return hulls, levels, cost, bound, (k, position)
+                used += weight
+                cost += delta
+                levels[k] = position + 1
+            return hulls, levels, cost, cost, None
+
+        best_cost = math.inf
+        best_choice = None
+        stack = [{}]
+        nodes = 0
+        while stack:
+            nodes += 1
+            if nodes > self.node_limit:
+                self.proven_optimal = False
+                break
+            ranges = stack.pop()
+            relaxation = relax(ranges)
+            if relaxation is None:
+                continue
+            hulls, levels, cost, bound, fractional = relaxation
+            if math.ceil(bound - 1e-9) >= best_cost:
+                continue
+            if cost < best_cost:
+                best_cost = cost
+                best_choice = [hulls[k][level] for k, level in enumerate(levels)]
+            if fractional is None:
+                continue
+
+            k, position = fractional
+            machine_count = choices[k][0][hulls[k][position]]
+            lo, hi = ranges.get(k, (0, math.inf))
+            stack.append({**ranges, k: (lo, machine_count - 1)})
+            stack.append({**ranges, k: (machine_count, hi)})
+
+        count('branch_and_bound_nodes', nodes)
+        if best_choice is None:
+            return None
+        return np.array([choices[k][0][j] for k, j in enumerate(best_choice)], dtype=np.int64)
+
+    def build_solution(self, machines):
+        products = self.products
+        max_time = self.constraints.max_time
+        rates = self.automation_rates()
+        solution = FactorySolution(products)
+        solution.name = 'MILP'
+        for i in range(len(products)):
+            machine_count = machines[i]
+            needed = self.handcrafting_needed(i, machine_count, rates)
+            solution.machine_array[i] = machine_count
+            if needed > 0:
+                solution.automation_time_array[i] = max_time
+                solution.automation_production_array[i] = math.floor(max_time * machine_count * rates[i] / 60.0)
+                solution.handcrafting_time_array[i] = self.handcrafting_time_for(i, needed)
+                solution.handcrafting_production_array[i] = needed
+            else:
+                solution.automation_time_array[i] = math.ceil(60.0 * products.quantities[i] / (machine_count * rates[i]))
+                solution.automation_production_array[i] = products.quantities[i]
+        solution.compute_derived_values()
+        return solution
+
+
+BuildStep = namedtuple('BuildStep', ['project', 'total_time', 'handcrafting_time', 'built', 'machines'])
+BuildPlan = namedtuple('BuildPlan', ['order', 'total_time', 'steps'])
+
+
+class BuildPlanner:
+    # playthrough order of several projects, where the machines placed for one project stay up for the next. plan()
+    # finds the fastest order by DP over the subsets of completed projects.
+    def __init__(self, constraints, solver_class=None, solver_log_level=LOG_OFF):
+        # solver_log_level caps the logging of the planner's own solves and step evaluations; the build order is
+        # logged as usual.
+        self.constraints = constraints
+        self.solver_class = solver_class or FactorySolver2
+        self.solver_log_level = solver_log_level
+        self.machine_plans = {}
+        self.project_requirements = {}
+        self.steps = {}
+        self.evaluator = FactorySolver()
+        self.evaluator.constraints = constraints
+        # everything needed to place one building, flattened like a project's requirements.
+        self.building_costs = {}
+        for name, building in buildings.items():
+            cost = {}
+            for ingredient in building.get("ingredients", []):
+                if ingredient["name"] in recipes:
+                    cost[ingredient["name"]] = cost.get(ingredient["name"], 0) + ingredient["quantity"]
+                    add_ingredients(ingredient["name"], ingredient["quantity"], cost)
+            self.building_costs[name] = cost
+        self.automated_only = {product for cost in self.building_costs.values() for product in cost if not recipes[product].get("build_steps")}
+
+    def requirements(self, project_name):
+        if project_name not in self.project_requirements:
+            requirements = {}
+            gather_project_requirements(projects[project_name], requirements)
+            self.project_requirements[project_name] = requirements
+        return self.project_requirements[project_name]
+
+    def machine_plan(self, project_name):
+        if project_name not in self.machine_plans:
+            with log_level_at_most(self.solver_log_level):
+                solutions = self.solver_class().optimize_machines(project_name, self.constraints)
+            if not solutions:
+                raise ValueError(f'{self.solver_class.__name__} found no solution for {project_name}')
+            plan = {product: count for product, count in solutions[-1].machines.items() if count > 0}
+            for product in self.automated_only | {product for product in self.requirements(project_name) if not recipes[product].get("build_steps")}:
+                plan[product] = max(plan.get(product, 0), 1)
+            self.machine_plans[project_name] = plan
+        return self.machine_plans[project_name]
+
+    def standing_after(self, machines, project_name):
+        standing = dict(machines)
+        for product, count in self.machine_plan(project_name).items():
+            standing[product] = max(standing.get(product, 0), count)
+        return standing
+
+    def step(self, machines, project_name):
+        # building project_name on top of the standing machines ({product: count}).
+        key = (project_name, tuple(sorted(machines.items())))
+        if key in self.steps:
+            return self.steps[key]
+        count('planner_steps')
+        standing = self.standing_after(machines, project_name)
+        built = {product: number - machines.get(product, 0) for product, number in standing.items() if number > machines.get(product, 0)}
+        requirements = dict(self.requirements(project_name))
+        for product, number in built.items():
+            for name, quantity in self.building_costs[recipes[product]["building"]].items():
+                requirements[name] = requirements.get(name, 0) + quantity * number
+
+        products = ProductIndex(requirements)
+        solution = FactorySolution(products)
+        solution.machine_array = np.array([standing.get(product, 0) for product in products.names], dtype=np.int64)
+        self.evaluator.products = products
+        self.evaluator.requirements = requirements
+        with log_level_at_most(self.solver_log_level):
+            solution.evaluate_solution_time(self.constraints)
+            solution = self.evaluator.optimize_handcrafting(solution)
+        step = BuildStep(project_name, solution.total_time, solution.handcrafting_time, built, standing)
+        self.steps[key] = step
+        return step
+
+    def evaluate(self, order):
+        # the playthrough for the projects in the given order.
+        steps = []
+        machines = {}
+        for project_name in order:
+            steps.append(self.step(machines, project_name))
+            machines = steps[-1].machines
+        plan = BuildPlan(tuple(order), sum(step.total_time for step in steps), steps)
+        self.log_plan(plan)
+        return plan
+
+    def plan(self, project_names=None):
+        # the order of project_names (all projects by default) with the shortest playthrough. Subsets are visited
+        # in increasing bitmask order, so every subset comes after all of its own subsets.
+        project_names = list(projects) if project_names is None else list(project_names)
+        standing = [{}]
+        best = [(0, -1)]
+        for mask in range(1, 1 << len(project_names)):
+            lowest = (mask & -mask).bit_length() - 1
+            standing.append(self.standing_after(standing[mask ^ (1 << lowest)], project_names[lowest]))
+            best_time, best_last = math.inf, -1
+            for k in range(len(project_names)):
+                if mask >> k & 1:
+                    previous = mask ^ (1 << k)
+                    total_time = best[previous][0] + self.step(standing[previous], project_names[k]).total_time
+                    if total_time < best_time:
+                        best_time, best_last = total_time, k
+            best.append((best_time, best_last))
+        count('planner_states', len(best))
+
+        order = []
+        mask = len(best) - 1
+        while mask:
+            k = best[mask][1]
+            order.append(project_names[k])
+            mask ^= 1 << k
+        return self.evaluate(order[::-1])
+
+    def log_plan(self, plan):
+        for step in plan.steps:
+            trace('build_step', LOG_SUMMARY, **step._asdict())
+        if not log_enabled(LOG_SUMMARY):
+            return
+        log('')
+        log(f'Build order, {ftime(plan.total_time)} in total:')
+        for step in plan.steps:
+            built = ', '.join(f'{number} {product}' for product, number in step.built.items())
+            log(f'{step.project}: {ftime(step.total_time)}, manual {ftime(step.handcrafting_time)}' + (f', new machines: {built}' if built else ''))
+
+
+def solution_record(solution, **fields):
+    # compact, JSON-friendly summary of a solution: the fields given first, then the times and the nonzero machines.
+    return {
+        **fields,
+        'name': solution.name,
+        'machine_count': solution.machine_count,
+        'constructor_count': solution.constructor_count,
+        'total_time': solution.total_time,
+        'automation_time': solution.automation_time,
+        'handcrafting_time': solution.handcrafting_time,
+        'machines': {product: count for product, count in solution.machines.items() if count > 0},
+        'handcrafting_times': dict(solution.handcrafting_times.items()),
+    }
+
+
+def benchmark_solvers(project_names, constraints, solver_classes=(FactorySolver, FactorySolver2, FactorySolverMILP)):
+    # wall time and quality of the final solution of each solver, for each project. The machine counts aren't quite
+    # like for like: FactorySolver2 ignores conveyor_speed, which caps the rates FactorySolver and FactorySolverMILP
+    # work with, so it can get by with fewer machines than the exact solver whenever a rate exceeds the conveyor.
+    results = []
+    for project_name in project_names:
+        for solver_class in solver_classes:
+            solver = solver_class()
+            start = time.perf_counter()
+            solutions = solver.optimize_machines(project_name, constraints)
+            elapsed = time.perf_counter() - start
+            final = solutions[-1] if solutions else None
+            results.append({
+                'project': project_name,
+                'solver': solver_class.__name__,
+                'seconds': elapsed,
+                'machine_count': final.machine_count if final else None,
+                'constructor_count': final.constructor_count if final else None,
+                'total_time': final.total_time if final else None,
+                'handcrafting_time': final.handcrafting_time if final else None,
+                'proven_optimal': getattr(solver, 'proven_optimal', None),
+            })
+
+    for result in results:
+        trace('benchmark', LOG_SUMMARY, **result)
+    if not log_enabled(LOG_SUMMARY):
+        return results
+    log('')
+    log('Solver benchmark (FactorySolver2 ignores conveyor_speed):')
+    for result in results:
+        if result['machine_count'] is None:
+            log(f"{result['project']:<28} {result['solver']:<18} {result['seconds'] * 1000.0:9.1f} ms  no solution")
+        else:
+            log(
+                f"{result['project']:<28} {result['solver']:<18} {result['seconds'] * 1000.0:9.1f} ms  "
+                f"{result['machine_count']} machines, {result['constructor_count']} constructors, "
+                f"total {ftime(result['total_time'])}, manual {ftime(result['handcrafting_time'])}"
+                + (' (not proven optimal)' if result['proven_optimal'] is False else '')
+            )
+    return results
+
+
+# compiled game data: the topological order and the flattened per-unit bill of materials over interned product
+# ids, stored as raw little-endian arrays that are mapped straight from the file, so loading skips the sort and the
+# flattening. The game data records are still stored and parsed as compact JSON.
+# Layout: header, section table (name, dtype, offset, count), then 8-byte aligned sections.
+SNAPSHOT_MAGIC = b'SATSNAP\0'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8sIIqq32s')
+SNAPSHOT_SECTION = struct.Struct('<16s4sqq')
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def write_snapshot(path, source_path, data):
+    # compile the loaded game data; recipe_order and flat_requirements must be current for data.
+    strings = {name: i for i, name in enumerate(recipe_order)}
+    offsets = [0]
+    names = []
+    quantities = []
+    for name in recipe_order:
+        per_unit = flat_requirements[name]
+        names.extend(strings.setdefault(ingredient, len(strings)) for ingredient in per_unit)
+        quantities.extend(per_unit.values())
+        offsets.append(len(names))
+    encoded = [name.encode() for name in strings]
+    sections = {
+        'data': np.frombuffer(json.dumps(data, separators=(',', ':')).encode(), dtype='u1'),
+        'strings.offsets': np.cumsum([0] + [len(name) for name in encoded], dtype='<i8'),
+        'strings.data': np.frombuffer(b''.join(encoded), dtype='u1'),
+        'order': np.arange(len(recipe_order), dtype='<i4'),
+        'flat.offsets': np.array(offsets, dtype='<i8'),
+        'flat.name': np.array(names, dtype='<i4'),
+        'flat.quantity': np.array(quantities, dtype='<f8'),
+    }
+
+    size, mtime_ns = source_signature(source_path)
+    offset = SNAPSHOT_HEADER.size + SNAPSHOT_SECTION.size * len(sections)
+    table = []
+    for name, array in sections.items():
+        offset = (offset + 7) // 8 * 8
+        table.append(SNAPSHOT_SECTION.pack(name.encode(), array.dtype.str.encode(), offset, len(array)))
+        offset += array.nbytes
+
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(sections), size, mtime_ns, file_digest(source_path)))
+        f.write(b''.join(table))
+        for array in sections.values():
+            f.write(b'\0' * (-f.tell() % 8))
+            f.write(array.tobytes())
+    # written aside and moved into place, so concurrent loaders (e.g. pool workers) never see a partial file.
+    os.replace(temporary_path, path)
+
+
+def read_snapshot(path, source_path):
+    # the snapshot's sections, or None when it is missing, from another format version, out of date or truncated
+    # (init() then rebuilds it). A source whose mtime changed still matches when its content hash is the same, and
+    # the header then takes the new size and mtime so that later loads skip the hash.
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    with f:
+        header = f.read(SNAPSHOT_HEADER.size)
+        if len(header) < SNAPSHOT_HEADER.size:
+            return None
+        magic, version, section_count, size, mtime_ns, digest = SNAPSHOT_HEADER.unpack(header)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        signature = source_signature(source_path)
+        if signature != (size, mtime_ns) and digest != file_digest(source_path):
+            return None
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    sections = {}
+    try:
+        for index in range(section_count):
+            name, dtype, offset, count = SNAPSHOT_SECTION.unpack_from(buffer, SNAPSHOT_HEADER.size + index * SNAPSHOT_SECTION.size)
+            dtype = np.dtype(dtype.rstrip(b'\0').decode())
+            if offset < 0 or count < 0 or offset + count * dtype.itemsize > len(buffer):
+                return None
+            sections[name.rstrip(b'\0').decode()] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+    except (ValueError, TypeError, struct.error):
+        return None
+    if signature != (size, mtime_ns):
+        refresh_snapshot_signature(path, buffer, signature)
+    return sections
+
+
+def refresh_snapshot_signature(path, buffer, signature):
+    # rewritten aside like write_snapshot; loading carries on from the old mapping if that fails.
+    magic, version, section_count, _, _, digest = SNAPSHOT_HEADER.unpack_from(buffer)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(magic, version, section_count, *signature, digest))
+            f.write(buffer[SNAPSHOT_HEADER.size:])
+        os.replace(temporary_path, path)
+    except OSError as error:
+        log(f'Game data snapshot header not updated: {error}')
+
+
+def load_snapshot(sections):
+    data = sections['strings.data'].tobytes()
+    offsets = sections['strings.offsets'].tolist()
+    strings = np.array([data[start:end].decode() for start, end in zip(offsets, offsets[1:])], dtype=object)
+    load_game_data(json.loads(sections['data'].tobytes()), strings[sections['order']].tolist())
+
+    offsets = sections['flat.offsets'].tolist()
+    names = strings[sections['flat.name']].tolist()
+    quantities = sections['flat.quantity'].tolist()
+    flat_requirements.clear()
+    for product, start, end in zip(recipe_order, offsets, offsets[1:]):
+        flat_requirements[product] = dict(zip(names[start:end], quantities[start:end]))
+
+
+def load_game_data(data, order=None):
     for recipe in data["recipes"]:
         recipes[recipe["name"]] = recipe
+    alternate_recipes.clear()
+    default_recipes.clear()
+    for recipe in data.get("alternates", []):
+        alternate_recipes.setdefault(recipe["product"], []).append(recipe)
     for project in data["projects"]:
         projects[project["name"]] = project
     for building in data["buildings"]:
         buildings[building["name"]] = building
+    recipe_order[:] = sort_recipes() if order is None else order
+    recipe_rank.clear()
+    recipe_rank.update({name: rank for rank, name in enumerate(recipe_order)})
+
+
+def init(path="game_data.json", snapshot_path=None):
+    # game data is read from a compiled snapshot next to the JSON (game_data.snapshot) when that is current, and
+    # the snapshot is rebuilt from the JSON otherwise. snapshot_path=False always parses the JSON.
+    log(f'Starting Satisfactory Solver @ {datetime.now()}')
+    if snapshot_path is None:
+        snapshot_path = os.path.splitext(path)[0] + '.snapshot'
+    sections = read_snapshot(snapshot_path, path) if snapshot_path else None
+    if sections is not None:
+        log('Loading game data snapshot.')
+        load_snapshot(sections)
+        return
+
+    log('Loading game data.')
+    with open(path) as f:
+        data = json.load(f)
+    load_game_data(data)
+    flat_requirements.clear()
+    for product in recipe_order:
+        build_flat_requirements(product)
+    if snapshot_path:
+        try:
+            write_snapshot(snapshot_path, path, data)
+        except OSError as error:
+            log(f'Game data snapshot not written: {error}')
 
 def analyze():
     projects = [
@@ -472,13 +2661,18 @@ def analyze():
         "Project Assembly Phase 1",
         "Coal Power",
     ]
-    power = gather_power_requirements_projects(projects)
+    budget = ProjectBudget()
+    power = math.ceil(budget.combination(budget.mask(projects)).power)
 
     biofuel = math.ceil(power / 450.0)
     biomass = math.ceil(power / 180.0)
     wood = math.ceil(biomass / 5.0)
     leaves = math.ceil(biomass * 2.0)
     log(f"Power requirement is {power / 1000.0:.1f} GJ ({biofuel} biofuel, {wood} wood, {leaves} leaves.")
+    for tier, combination in budget.tier_rollup(cumulative=True).items():
+        resources = ", ".join(f"{quantity:.0f} {resource}" for resource, quantity in combination.resources.items())
+        log(f"{'Up to tier ' + str(tier) if tier is not None else 'Without a tier'}: {combination.power / 1000.0:.1f} GJ, {resources}")
+    log(f"{len(budget.within(power, maximal=True))} largest project combinations fit in the same power.")
 
     constraints = FactoryConstraints()
     constraints.conveyor_speed = 120
@@ -493,9 +2687,12 @@ def analyze():
 
     solver = FactorySolver2()
     solver.optimize_machines("Space Elevator", constraints)
-    
-    log_file.flush()
+
+    BuildPlanner(constraints).plan(projects)
 
 
-init()
-analyze()
+if __name__ == "__main__":
+    open_log()
+    init()
+    analyze()
+    close_log()
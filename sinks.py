@@ -0,0 +1,165 @@
+import csv
+import functools
+import json
+import os
+import struct
+
+import numpy as np
+
+import satisfactory
+
+
+class RecordSink:
+    # destination for a stream of records (dicts, as made by satisfactory.solution_record). Records are buffered and written out
+    # buffer_size at a time, so a sink holds at most that many however long the stream.
+    def __init__(self, path, buffer_size=256):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.written = 0
+        self.file = self.open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        return open(self.path, 'w', newline='')
+
+    def write(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.write_records(self.buffer)
+            self.written += len(self.buffer)
+            self.buffer = []
+        self.file.flush()
+
+    def write_records(self, records):
+        raise NotImplementedError()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+
+class JsonLinesSink(RecordSink):
+    def write_records(self, records):
+        self.file.writelines(json.dumps(record, separators=(',', ':'), default=satisfactory.trace_value) + '\n' for record in records)
+
+
+class CsvSink(RecordSink):
+    # one row per record. The columns are fields, or the keys of the first record; nested values such as the
+    # machines are written as compact JSON.
+    def __init__(self, path, buffer_size=256, fields=None):
+        self.fields = fields
+        self.writer = None
+        super().__init__(path, buffer_size)
+
+    def write_records(self, records):
+        if self.writer is None:
+            self.fields = self.fields or list(records[0])
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fields, extrasaction='ignore')
+            self.writer.writeheader()
+        for record in records:
+            self.writer.writerow({field: self.cell(record.get(field, '')) for field in self.fields})
+
+    @staticmethod
+    def cell(value):
+        if isinstance(value, (dict, list, tuple, set, np.ndarray)):
+            return json.dumps(value, separators=(',', ':'), default=satisfactory.trace_value)
+        return value
+
+
+class ColumnarSink(RecordSink):
+    # column-oriented binary file: a magic line, then one row group per flush. A row group is an 8-byte header
+    # length, a JSON header naming the rows and the columns' dtypes and sizes, then each column's raw NumPy bytes,
+    # padded to 8 bytes. Dict fields are spread over one column per key ("machines.Iron Plate"), and a key missing
+    # from a record reads as 0, which is what the records leave out. read_columnar loads the file back.
+    magic = b'SFCOLUMNS1\n'
+
+    def open(self):
+        file = open(self.path, 'wb')
+        file.write(self.magic)
+        return file
+
+    def write_records(self, records):
+        values = {}
+        for row, record in enumerate(records):
+            for name, value in self.flatten(record):
+                values.setdefault(name, {})[row] = value
+
+        columns = []
+        for name, column in values.items():
+            if all(isinstance(value, (bool, int, float, np.number)) for value in column.values()):
+                floating = any(isinstance(value, (float, np.floating)) for value in column.values())
+                array = np.zeros(len(records), dtype=np.float64 if floating else np.int64)
+                for row, value in column.items():
+                    array[row] = value
+            else:
+                array = np.array([self.text(column.get(row, '')) for row in range(len(records))], dtype=str)
+            columns.append((name, array))
+
+        header = json.dumps({'rows': len(records), 'columns': [[name, array.dtype.str, array.nbytes] for name, array in columns]}).encode()
+        header += b' ' * (-(len(header) + 8) % 8)
+        self.file.write(struct.pack('<Q', len(header)) + header)
+        for name, array in columns:
+            self.file.write(array.tobytes() + bytes(-array.nbytes % 8))
+
+    @staticmethod
+    def flatten(record):
+        for name, value in record.items():
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    yield f'{name}.{key}', item
+            else:
+                yield name, value
+
+    @staticmethod
+    def text(value):
+        return value if isinstance(value, str) else json.dumps(value, separators=(',', ':'), default=satisfactory.trace_value)
+
+
+def read_columnar(path):
+    # the columns of a ColumnarSink file as NumPy arrays, over all its row groups. A column missing from a row
+    # group is 0 (or '') there.
+    groups = []
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(ColumnarSink.magic):
+        raise ValueError(f'{path} is not a columnar record file')
+    offset = len(ColumnarSink.magic)
+    while offset < len(data):
+        (header_size,) = struct.unpack_from('<Q', data, offset)
+        header = json.loads(data[offset + 8:offset + 8 + header_size])
+        offset += 8 + header_size
+        group = {}
+        for name, dtype, size in header['columns']:
+            group[name] = np.frombuffer(data, dtype=dtype, count=header['rows'], offset=offset)
+            offset += size + (-size % 8)
+        groups.append((header['rows'], group))
+
+    names = list(dict.fromkeys(name for rows, group in groups for name in group))
+    columns = {}
+    for name in names:
+        dtype = functools.reduce(np.promote_types, (group[name].dtype for rows, group in groups if name in group))
+        columns[name] = np.concatenate([group[name] if name in group else np.zeros(rows, dtype=dtype) for rows, group in groups])
+    return columns
+
+
+RECORD_SINKS = {'.jsonl': JsonLinesSink, '.csv': CsvSink, '.cols': ColumnarSink}
+
+
+def open_sink(path, buffer_size=256, **kwargs):
+    # the sink for path's extension: .jsonl, .csv or .cols (ColumnarSink).
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in RECORD_SINKS:
+        raise ValueError(f'No record sink for {extension!r} files, expected one of {list(RECORD_SINKS)}')
+    return RECORD_SINKS[extension](path, buffer_size, **kwargs)
@@ -0,0 +1,206 @@
+import argparse
+import itertools
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import satisfactory
+import sinks
+from cache import SolveCache
+
+Scenario = namedtuple('Scenario', ['index', 'project', 'solver', 'max_time', 'conveyor_speed', 'max_buildings'])
+
+RESULT_FIELDS = [
+    'index',
+    'project',
+    'solver',
+    'max_time',
+    'conveyor_speed',
+    'max_buildings',
+    'machine_count',
+    'constructor_count',
+    'total_time',
+    'automation_time',
+    'handcrafting_time',
+    'iterations',
+    'seconds',
+    'machines',
+]
+
+
+def scenario_grid(project_names, max_times, conveyor_speeds, max_buildings_grid=None, solver='FactorySolver2'):
+    # max_buildings_grid maps a product to the caps to try for it (None meaning uncapped); every combination of
+    # caps is crossed with every project, max_time and conveyor_speed.
+    if min(max_times) <= 0 or min(conveyor_speeds) <= 0:
+        raise ValueError(f'max_times and conveyor_speeds must be positive, got {max_times} and {conveyor_speeds}')
+    max_buildings_grid = max_buildings_grid or {}
+    cap_products = list(max_buildings_grid.keys())
+    cap_options = []
+    for caps in itertools.product(*(max_buildings_grid[product] for product in cap_products)):
+        cap_options.append({product: cap for product, cap in zip(cap_products, caps) if cap is not None})
+
+    scenarios = []
+    for project, max_time, conveyor_speed, max_buildings in itertools.product(project_names, max_times, conveyor_speeds, cap_options):
+        scenarios.append(Scenario(len(scenarios), project, solver, max_time, conveyor_speed, max_buildings))
+    return scenarios
+
+
+worker_cache = None
+
+
+def init_worker(game_data_path, cache_path=None):
+    # runs once per worker process: load the recipes once. Logging stays off in the workers.
+    global worker_cache
+    satisfactory.init(game_data_path)
+    if cache_path is not None:
+        worker_cache = SolveCache(cache_path)
+
+
+def scenario_constraints(scenario):
+    constraints = satisfactory.FactoryConstraints()
+    constraints.max_time = scenario.max_time
+    constraints.conveyor_speed = scenario.conveyor_speed
+    constraints.max_buildings = dict(scenario.max_buildings)
+    return constraints
+
+
+def run_scenario(scenario, trajectory_dir=None):
+    # with trajectory_dir, every iteration of the solve is streamed to <trajectory_dir>/<index>.<format> instead of
+    # going through the cache, keeping only the final solution in memory.
+    solver = getattr(satisfactory, scenario.solver)()
+    solver.cache = worker_cache
+    start = time.perf_counter()
+    if trajectory_dir is None:
+        solutions = solver.optimize_machines(scenario.project, scenario_constraints(scenario))
+        return scenario_result(scenario, solutions[-1] if solutions else None, len(solutions), time.perf_counter() - start)
+    with sinks.open_sink(trajectory_path(trajectory_dir, scenario)) as sink:
+        final = solver.stream_machines(scenario.project, scenario_constraints(scenario), [sink])
+        return scenario_result(scenario, final, sink.written, time.perf_counter() - start)
+
+
+def trajectory_path(trajectory_dir, scenario):
+    directory, extension = trajectory_dir
+    return os.path.join(directory, f'{scenario.index}{extension}')
+
+
+def cached_result(scenario, cache):
+    # the scenario's result straight from the cache, or None when it still has to be solved.
+    solver = getattr(satisfactory, scenario.solver)()
+    start = time.perf_counter()
+    solver.prepare(scenario.project, scenario_constraints(scenario))
+    solutions = cache.get(solver.cache_key(), solver.products)
+    if solutions is None:
+        return None
+    return scenario_result(scenario, solutions[-1] if solutions else None, len(solutions), time.perf_counter() - start)
+
+
+def scenario_result(scenario, final, iterations, elapsed):
+    result = dict(scenario._asdict())
+    result['iterations'] = iterations
+    result['seconds'] = elapsed
+    if final is not None:
+        result['machine_count'] = final.machine_count
+        result['constructor_count'] = final.constructor_count
+        result['total_time'] = final.total_time
+        result['automation_time'] = final.automation_time
+        result['handcrafting_time'] = final.handcrafting_time
+        result['machines'] = {product: count for product, count in final.machines.items() if count > 0}
+    return result
+
+
+def sweep(scenarios, workers=None, game_data_path='game_data.json', cache_path=None, trajectory_dir=None):
+    # yields each scenario's result as soon as it is solved, in completion order. With a cache, scenarios solved
+    # before are answered from it first, and only the rest go to the worker processes (which add their results).
+    # trajectory_dir is a (directory, extension) pair: every scenario is then solved, streaming its iterations to
+    # a file of its own, and the cache is left out.
+    game_data_path = os.path.abspath(game_data_path)
+    if trajectory_dir is not None:
+        trajectory_dir = (os.path.abspath(trajectory_dir[0]), trajectory_dir[1])
+        os.makedirs(trajectory_dir[0], exist_ok=True)
+        cache_path = None
+    if cache_path is not None:
+        cache_path = os.path.abspath(cache_path)
+        satisfactory.init(game_data_path)
+        cache = SolveCache(cache_path)
+        try:
+            pending = []
+            for scenario in scenarios:
+                result = cached_result(scenario, cache)
+                if result is None:
+                    pending.append(scenario)
+                else:
+                    yield result
+        finally:
+            cache.close()
+        scenarios = pending
+    if not scenarios:
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(game_data_path, cache_path)) as executor:
+        futures = [executor.submit(run_scenario, scenario, trajectory_dir) for scenario in scenarios]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def sweep_table(scenarios, workers=None, game_data_path='game_data.json', cache_path=None, trajectory_dir=None):
+    return sorted(sweep(scenarios, workers, game_data_path, cache_path, trajectory_dir), key=lambda result: result['index'])
+
+
+def open_results(path):
+    # a record sink for path's extension, with the CSV columns fixed since cached and failed results may lack some.
+    options = {'fields': RESULT_FIELDS} if path.lower().endswith('.csv') else {}
+    return sinks.open_sink(path, buffer_size=1, **options)
+
+
+def parse_caps(values):
+    # "Iron Ingot=1,2,3" -> {"Iron Ingot": [1, 2, 3]}, with "none" for uncapped.
+    grid = {}
+    for value in values or []:
+        product, _, caps = value.rpartition('=')
+        grid[product] = [None if cap.strip().lower() == 'none' else int(cap) for cap in caps.split(',')]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve every project across a grid of factory constraints.')
+    parser.add_argument('--project', action='append', help='project to solve (repeatable, default: every project)')
+    parser.add_argument('--max-time', type=int, nargs='+', default=[600], help='time limits in seconds')
+    parser.add_argument('--conveyor-speed', type=int, nargs='+', default=[120], help='conveyor speeds in items/min')
+    parser.add_argument('--cap', action='append', help='building caps to try for a product, e.g. "Iron Ingot=1,2,none"')
+    parser.add_argument('--solver', default='FactorySolver2')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--game-data', default='game_data.json')
+    parser.add_argument('--output', default='sweep.csv', help='results file, written as they complete: .csv, .jsonl or .cols (columnar)')
+    parser.add_argument('--sorted', action='store_true', help='write the results in scenario order once the sweep is done')
+    parser.add_argument('--cache', help='SQLite file caching solves between runs')
+    parser.add_argument('--trajectories', help='directory to stream every iteration of each scenario to, one file per scenario')
+    parser.add_argument('--trajectory-format', default='.jsonl', choices=sorted(sinks.RECORD_SINKS))
+    args = parser.parse_args()
+
+    project_names = args.project
+    if not project_names:
+        satisfactory.init(args.game_data)
+        project_names = list(satisfactory.projects.keys())
+
+    scenarios = scenario_grid(project_names, args.max_time, args.conveyor_speed, parse_caps(args.cap), args.solver)
+    trajectory_dir = (args.trajectories, args.trajectory_format) if args.trajectories else None
+    if args.sorted:
+        results = sweep_table(scenarios, args.workers, args.game_data, args.cache, trajectory_dir)
+        with open_results(args.output) as sink:
+            for result in results:
+                sink.write(result)
+        print(f'Wrote {len(results)} results to {args.output}')
+        return
+
+    # results go out as they complete, so an interrupted sweep keeps what it has solved.
+    with open_results(args.output) as sink:
+        for result in sweep(scenarios, args.workers, args.game_data, args.cache, trajectory_dir):
+            sink.write(result)
+            print(f"[{sink.written}/{len(scenarios)}] {result['project']} max_time={result['max_time']} conveyor={result['conveyor_speed']} "
+                  f"caps={result['max_buildings']}: {result.get('machine_count')} machines, total {result.get('total_time')}s")
+    print(f'Wrote {sink.written} results to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
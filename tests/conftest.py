@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import satisfactory  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def game_data():
+    # the repo's recipes and projects, parsed from the JSON so that the tests don't write a snapshot.
+    satisfactory.init(os.path.join(ROOT, 'game_data.json'), snapshot_path=False)
+    return satisfactory
+
+
+def constraints(max_time=600, conveyor_speed=120, max_buildings=None):
+    result = satisfactory.FactoryConstraints()
+    result.max_time = max_time
+    result.conveyor_speed = conveyor_speed
+    result.max_buildings = dict(max_buildings or {})
+    return result
+
+
+def project_products(project_name):
+    requirements = {}
+    satisfactory.gather_project_requirements(satisfactory.projects[project_name], requirements)
+    return satisfactory.ProductIndex(requirements)
@@ -0,0 +1,44 @@
+import random
+
+import numpy as np
+import pytest
+
+import satisfactory
+from conftest import constraints, project_products
+
+
+def evaluated(products, machine_array, factory_constraints):
+    solution = satisfactory.FactorySolution(products)
+    solution.machine_array = np.array(machine_array, dtype=np.int64)
+    solution.evaluate_solution_time(factory_constraints)
+    solution.compute_derived_values()
+    return solution
+
+
+def assert_same_state(solution, expected):
+    np.testing.assert_array_equal(solution.machine_array, expected.machine_array)
+    np.testing.assert_array_equal(solution.automation_time_array, expected.automation_time_array)
+    np.testing.assert_array_equal(solution.automation_production_array, expected.automation_production_array)
+    np.testing.assert_array_equal(solution.handcrafting_time_array, expected.handcrafting_time_array)
+    np.testing.assert_array_equal(solution.handcrafting_production_array, expected.handcrafting_production_array)
+    assert solution.handcrafting_order == expected.handcrafting_order
+    assert solution.automation_time == expected.automation_time
+    assert solution.handcrafting_time == expected.handcrafting_time
+    assert solution.total_time == expected.total_time
+    assert solution.machine_count == expected.machine_count
+    assert solution.constructor_count == expected.constructor_count
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_apply_delta_matches_full_evaluation(game_data, seed):
+    rng = random.Random(seed)
+    project_names = sorted(satisfactory.projects)
+    factory_constraints = constraints(conveyor_speed=rng.choice([60, 120, 270]))
+    for project_name in rng.sample(project_names, min(5, len(project_names))):
+        products = project_products(project_name)
+        solution = evaluated(products, [rng.randint(0, 3) for _ in range(len(products))], factory_constraints)
+        for step in range(100):
+            i = rng.randrange(len(products))
+            delta = 1 if solution.machine_array[i] == 0 else rng.choice([-1, 1])
+            solution.apply_delta(products.names[i], delta, factory_constraints)
+            assert_same_state(solution, evaluated(products, solution.machine_array, factory_constraints))
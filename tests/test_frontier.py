@@ -0,0 +1,43 @@
+import pytest
+
+import satisfactory
+from conftest import constraints
+
+MAX_TIMES = [300, 600, 900, 1200]
+
+
+def cold_points(project_name, max_time):
+    solutions = satisfactory.FactorySolver2().optimize_machines(project_name, constraints(max_time))
+    return [satisfactory.FrontierPoint(solution.machine_count, solution.constructor_count, solution.total_time, solution.handcrafting_time, max_time, None)
+            for solution in solutions]
+
+
+@pytest.mark.parametrize('project_name', ['Base Building', 'Space Elevator', 'Coal Power'])
+def test_frontier_is_not_dominated_by_cold_solves(game_data, project_name):
+    frontier = satisfactory.FactorySolver2().optimize_frontier(project_name, constraints(), MAX_TIMES)
+    assert frontier
+    for point in frontier:
+        assert not any(satisfactory.dominates(other, point) for other in frontier)
+        for max_time in MAX_TIMES:
+            assert not any(satisfactory.dominates(cold, point) for cold in cold_points(project_name, max_time))
+
+
+@pytest.mark.parametrize('project_name', ['Base Building', 'Space Elevator', 'Coal Power'])
+def test_frontier_matches_cold_solves(game_data, project_name):
+    points = [point for max_time in MAX_TIMES for point in cold_points(project_name, max_time)]
+    expected = sorted(tuple(points[k][:5]) for k in satisfactory.non_dominated([point[:4] for point in points]))
+    frontier = satisfactory.FactorySolver2().optimize_frontier(project_name, constraints(), MAX_TIMES)
+    assert [tuple(point[:5]) for point in frontier] == expected
+
+
+def iterations(monkeypatch, solve):
+    stats = satisfactory.SolverStats()
+    monkeypatch.setattr(satisfactory, 'profile_stats', stats)
+    solve()
+    return stats.counters.get('iterations', 0)
+
+
+def test_frontier_shares_iterations_across_limits(game_data, monkeypatch):
+    cold = sum(iterations(monkeypatch, lambda: cold_points('Base Building', max_time)) for max_time in MAX_TIMES)
+    shared = iterations(monkeypatch, lambda: satisfactory.FactorySolver2().optimize_frontier('Base Building', constraints(), MAX_TIMES))
+    assert 0 < shared < cold
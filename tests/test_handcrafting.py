@@ -0,0 +1,66 @@
+import copy
+import itertools
+import random
+
+import pytest
+
+import satisfactory
+from conftest import constraints
+
+# FactorySolver's final (total_time, handcrafting_time) per project at max_time 600 and conveyor speed 120, with the
+# leftover manual time allocated from the bottleneck down.
+FACTORY_SOLVER_TIMES = {
+    'Base Building': (60, 60),
+    'Logistics': (60, 56),
+    'Field Research': (60, 56),
+    'Part Assembly': (60, 60),
+    'Obstacle Clearing': (58, 57),
+    'Jump Pads': (60, 60),
+    'Resource Sink Bonus Program': (60, 58),
+    'Logistics Mk.2': (60, 59),
+    'Space Elevator': (60, 60),
+    'Project Assembly Phase 1': (60, 60),
+    'Coal Power': (107, 107),
+}
+
+
+@pytest.mark.parametrize('project_name', sorted(FACTORY_SOLVER_TIMES))
+def test_factory_solver_times(game_data, project_name):
+    final = satisfactory.FactorySolver().optimize_machines(project_name, constraints())[-1]
+    assert (final.total_time, final.handcrafting_time) == FACTORY_SOLVER_TIMES[project_name]
+
+
+def brute_force_total_time(solver, solution):
+    # the shortest total time over every order of every subset of the products that can be finished by hand.
+    products = solver.products
+    candidates = [i for i in range(len(products)) if products.build_steps[i] != 0 and solution.machine_array[i] > 0]
+    best = solution.total_time
+    for length in range(1, len(candidates) + 1):
+        for order in itertools.permutations(candidates, length):
+            allocated = copy.copy(solution)
+            for i in order:
+                solver.allocate_remaining_handcrafting_time(allocated, products.names[i], solver.requirements)
+            best = min(best, allocated.total_time)
+    return best
+
+
+@pytest.mark.parametrize('project_name', ['Base Building', 'Logistics', 'Field Research', 'Logistics Mk.2', 'Space Elevator'])
+def test_optimize_handcrafting_matches_brute_force(game_data, project_name):
+    rng = random.Random(project_name)
+    factory_constraints = constraints()
+    solver = satisfactory.FactorySolver()
+    solver.prepare(project_name, factory_constraints)
+    products = solver.products
+    trials = 0
+    while trials < 15:
+        solution = satisfactory.FactorySolution(products)
+        for i in range(len(products)):
+            solution.machine_array[i] = 1 if products.build_steps[i] == 0 else rng.choice([0, 1, 1, 2, 3, 5])
+        if sum(products.build_steps[i] != 0 and solution.machine_array[i] > 0 for i in range(len(products))) > 6:
+            continue
+        trials += 1
+        solution.evaluate_solution_time(factory_constraints)
+        optimized = solver.optimize_handcrafting(copy.copy(solution))
+        # the allocation is itself one of the orders, so it can't beat the brute force; rounding to whole seconds
+        # may leave it one second behind.
+        assert abs(optimized.total_time - brute_force_total_time(solver, solution)) <= 1
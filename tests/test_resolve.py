@@ -0,0 +1,27 @@
+import pytest
+
+import satisfactory
+from conftest import constraints
+
+
+def test_rejected_change_leaves_solver_untouched(game_data):
+    solver = satisfactory.FactorySolver2()
+    solutions = solver.optimize_machines('Base Building', constraints())
+    previous_constraints, previous_requirements, previous_products = solver.constraints, dict(solver.requirements), solver.products
+    product = next(iter(solver.requirements))
+    with pytest.raises(ValueError):
+        solver.resolve(solutions, constraints(900), {product: -solver.requirements[product] - 1})
+    assert solver.constraints is previous_constraints
+    assert solver.requirements == previous_requirements
+    assert solver.products is previous_products
+
+
+def test_max_time_change_solves_cold(game_data, monkeypatch):
+    solver = satisfactory.FactorySolver2()
+    solutions = solver.optimize_machines('Base Building', constraints())
+    stats = satisfactory.SolverStats()
+    monkeypatch.setattr(satisfactory, 'profile_stats', stats)
+    resolved = solver.resolve(solutions, constraints(540))
+    cold = satisfactory.FactorySolver2().optimize_machines('Base Building', constraints(540))
+    assert stats.counters.get('reused_solutions', 0) == 0
+    assert [solution.machine_array.tolist() for solution in resolved] == [solution.machine_array.tolist() for solution in cold]
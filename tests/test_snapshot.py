@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import pytest
+
+import satisfactory
+from conftest import ROOT
+
+
+@pytest.mark.parametrize('keep', [0.0, 0.1, 0.5, 0.99])
+def test_truncated_snapshot_is_rebuilt(game_data, tmp_path, keep):
+    source_path = str(tmp_path / 'game_data.json')
+    snapshot_path = str(tmp_path / 'game_data.snapshot')
+    shutil.copy(os.path.join(ROOT, 'game_data.json'), source_path)
+    satisfactory.init(source_path)
+    with open(snapshot_path, 'rb') as f:
+        data = f.read()
+    with open(snapshot_path, 'wb') as f:
+        f.write(data[:int(len(data) * keep)])
+
+    assert satisfactory.read_snapshot(snapshot_path, source_path) is None
+    satisfactory.init(source_path)
+    assert satisfactory.read_snapshot(snapshot_path, source_path) is not None
+    with open(snapshot_path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_touched_source_refreshes_header(game_data, tmp_path):
+    source_path = str(tmp_path / 'game_data.json')
+    snapshot_path = str(tmp_path / 'game_data.snapshot')
+    shutil.copy(os.path.join(ROOT, 'game_data.json'), source_path)
+    satisfactory.init(source_path)
+    stat = os.stat(source_path)
+    os.utime(source_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert satisfactory.read_snapshot(snapshot_path, source_path) is not None
+    with open(snapshot_path, 'rb') as f:
+        _, _, _, size, mtime_ns, _ = satisfactory.SNAPSHOT_HEADER.unpack(f.read(satisfactory.SNAPSHOT_HEADER.size))
+    assert (size, mtime_ns) == satisfactory.source_signature(source_path)
+    assert satisfactory.read_snapshot(snapshot_path, source_path) is not None